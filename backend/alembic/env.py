@@ -0,0 +1,103 @@
+"""
+Entorno de Alembic: cómo se conecta a la base de datos para aplicar migraciones.
+
+Usa la misma DATABASE_URL que la API (postgresql+asyncpg://...), así que las
+migraciones corren con el driver asíncrono igual que el resto de la aplicación.
+
+target_metadata apunta a los modelos de app/models.py: con eso
+"alembic revision --autogenerate" compara los modelos con la base de datos y
+propone los cambios. La migración generada SIEMPRE hay que revisarla a mano
+(por ejemplo, para crear índices con CONCURRENTLY: ver la sección
+Migraciones del README).
+"""
+
+import asyncio
+import re
+from logging.config import fileConfig
+
+from sqlalchemy import pool
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from alembic import context
+
+from app.database import DATABASE_URL
+from app.models import Base
+
+# Objeto de configuración de Alembic, con los valores de alembic.ini
+config = context.config
+
+# Configurar el logging con las secciones de alembic.ini
+if config.config_file_name is not None:
+    fileConfig(config.config_file_name)
+
+# Metadata de los modelos, para --autogenerate
+target_metadata = Base.metadata
+
+# Nombre de las particiones mensuales de pixel_events (ej: pixel_events_2025_01)
+_PARTITION_NAME_RE = re.compile(r'pixel_events_\d{4}_\d{2}')
+
+
+def include_name(name, type_, parent_names) -> bool:
+    """
+    Decide qué objetos de la base de datos compara --autogenerate con los modelos.
+
+    Las particiones mensuales de pixel_events las crea la API en tiempo de
+    ejecución (ver ensure_pixel_event_partitions) y no están en models.py: sin
+    este filtro, autogenerate propondría borrarlas.
+    """
+    if type_ == "table":
+        return not _PARTITION_NAME_RE.fullmatch(name)
+    return True
+
+
+def run_migrations_offline() -> None:
+    """
+    Genera el SQL de las migraciones sin conectarse a la base de datos.
+
+    Se usa con "alembic upgrade head --sql": imprime el SQL en vez de ejecutarlo,
+    útil para revisarlo o para que lo aplique un DBA.
+    """
+    context.configure(
+        url=DATABASE_URL,
+        target_metadata=target_metadata,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+    )
+
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def do_run_migrations(connection: Connection) -> None:
+    """Aplica las migraciones pendientes sobre una conexión ya abierta."""
+    context.configure(
+        connection=connection,
+        target_metadata=target_metadata,
+        include_name=include_name,
+    )
+
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+async def run_async_migrations() -> None:
+    """
+    Aplica las migraciones conectándose con el driver asíncrono (asyncpg).
+
+    Alembic es síncrono por dentro: run_sync() ejecuta do_run_migrations sobre
+    la conexión asíncrona, igual que create_all() en la API.
+    """
+    # NullPool: el comando abre una sola conexión y termina, no necesita un pool
+    connectable = create_async_engine(DATABASE_URL, poolclass=pool.NullPool)
+
+    async with connectable.connect() as connection:
+        await connection.run_sync(do_run_migrations)
+
+    await connectable.dispose()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    asyncio.run(run_async_migrations())
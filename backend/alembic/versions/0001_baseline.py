@@ -0,0 +1,81 @@
+"""Esquema inicial: pixel_events (particionada), users y pixel_current
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-15
+
+Reemplaza a init_db.py: crea las mismas tablas e índices que antes creaba
+Base.metadata.create_all().
+
+Los índices de esta migración se crean sin CONCURRENTLY: las tablas están
+vacías, así que no hay nada que bloquear. Para agregar índices en migraciones
+futuras, ver la sección Migraciones del README.
+
+Las particiones mensuales de pixel_events no se crean aquí: las crea la API al
+arrancar y cada pocas horas mientras corre (ver ensure_pixel_event_partitions
+en app/database.py).
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# Identificadores de la revisión, usados por Alembic
+revision: str = '0001'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'pixel_events',
+        # autoincrement=True con BigInteger: BIGSERIAL (ver models.PixelEvent.id)
+        sa.Column('id', sa.BigInteger(), autoincrement=True, nullable=False),
+        sa.Column('x', sa.Integer(), nullable=False),
+        sa.Column('y', sa.Integer(), nullable=False),
+        sa.Column('color', sa.Integer(), nullable=False),
+        sa.Column('user_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        # La clave primaria debe incluir la columna de partición
+        sa.PrimaryKeyConstraint('id', 'created_at'),
+        postgresql_partition_by='RANGE (created_at)'
+    )
+    op.create_index(
+        'idx_pixel_coords_id_desc',
+        'pixel_events',
+        ['x', 'y', sa.text('id DESC')],
+        postgresql_include=['color', 'user_id', 'created_at']
+    )
+    op.create_index('idx_user_created', 'pixel_events', ['user_id', sa.text('created_at DESC')])
+    op.create_index('brin_pixel_created', 'pixel_events', ['created_at'], postgresql_using='brin')
+
+    op.create_table(
+        'users',
+        sa.Column('id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('username', sa.String(length=50), nullable=True),
+        sa.Column('total_pixels_placed', sa.Integer(), nullable=False),
+        sa.Column('last_pixel_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('username')
+    )
+
+    op.create_table(
+        'pixel_current',
+        sa.Column('x', sa.SmallInteger(), nullable=False),
+        sa.Column('y', sa.SmallInteger(), nullable=False),
+        sa.Column('color', sa.Integer(), nullable=False),
+        sa.Column('user_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('event_id', sa.BigInteger(), nullable=False),
+        sa.PrimaryKeyConstraint('x', 'y')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('pixel_current')
+    op.drop_table('users')
+    # Borrar la tabla particionada también borra todas sus particiones
+    op.drop_table('pixel_events')
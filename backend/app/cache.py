@@ -0,0 +1,281 @@
+"""
+Caché en Redis para las lecturas más frecuentes.
+
+Leer el estado completo del canvas es la petición más común de la API, pero el
+canvas cambia mucho menos seguido de lo que se lee. Guardamos la respuesta ya
+serializada en Redis y solo la recalculamos cuando alguien pinta un píxel.
+
+La invalidación usa un número de versión: cada píxel pintado incrementa
+"canvas:version", y el estado se guarda bajo "canvas:state:<versión>". Así nunca
+servimos un estado viejo, y las versiones anteriores expiran solas por su TTL.
+
+Todas las funciones toleran que Redis no esté configurado o no responda: en ese
+caso se comportan como un "cache miss" y la API sigue funcionando con PostgreSQL.
+"""
+
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+from uuid import UUID
+import redis
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import crud
+from .database import redis_client
+
+# Claves de Redis
+CANVAS_VERSION_KEY = "canvas:version"
+CANVAS_STATE_KEY_PREFIX = "canvas:state:"
+
+PIXELS_TOTAL_KEY = "pixels:total"
+ACTIVE_USERS_KEY_PREFIX = "users:active:"
+ACTIVE_USERS_SEEDED_KEY = "users:active:seeded"
+
+# Tiempo de vida del estado cacheado (en segundos)
+# Puede ser largo porque la versión ya garantiza que no sirvamos datos viejos
+CANVAS_STATE_TTL_SECONDS = 3600
+
+# Tiempo de vida del contador total de píxeles (en segundos)
+# Al expirar se vuelve a contar en PostgreSQL, lo que corrige cualquier desvío
+PIXELS_TOTAL_TTL_SECONDS = 3600
+
+# Ventana de "usuarios activos" (en horas) y tiempo de vida de cada bucket horario
+# Cada bucket vive un poco más que la ventana para que PFCOUNT siempre lo encuentre
+ACTIVE_USERS_WINDOW_HOURS = 24
+ACTIVE_USERS_BUCKET_TTL_SECONDS = (ACTIVE_USERS_WINDOW_HOURS + 1) * 3600
+
+# Script Lua: INCRBY solo si la clave existe
+# Si el contador no existe todavía no lo creamos desde cero (quedaría en 1 en vez
+# del total real); la próxima lectura lo inicializa con el COUNT de PostgreSQL
+_INCR_IF_EXISTS_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    return redis.call('INCRBY', KEYS[1], ARGV[1])
+end
+return nil
+"""
+
+
+def _canvas_state_key(version: int) -> str:
+    """Construye la clave de Redis para una versión del estado del canvas."""
+    return f"{CANVAS_STATE_KEY_PREFIX}{version}"
+
+
+async def _get_canvas_version() -> int:
+    """
+    Obtiene la versión actual del canvas.
+    
+    Returns:
+        La versión actual, o 0 si todavía nadie ha pintado desde que arrancó Redis
+    """
+    version = await redis_client.get(CANVAS_VERSION_KEY)
+    return int(version) if version else 0
+
+
+async def get_cached_canvas_state() -> Tuple[Optional[int], Optional[bytes]]:
+    """
+    Busca el estado del canvas serializado en la caché.
+    
+    La versión se lee ANTES de consultar PostgreSQL en caso de miss. Si alguien
+    pinta mientras recalculamos, guardamos el resultado bajo la versión vieja
+    (que ya nadie lee) en vez de dejar un estado desactualizado en la nueva.
+    
+    Returns:
+        Tupla de (versión, payload)
+        - versión: la versión actual del canvas, o None si Redis no está disponible
+        - payload: el JSON del estado del canvas, o None si no está en caché
+    """
+    if redis_client is None:
+        return None, None
+    
+    try:
+        version = await _get_canvas_version()
+        return version, await redis_client.get(_canvas_state_key(version))
+    except redis.RedisError:
+        # Si Redis falla, simplemente no usamos la caché
+        return None, None
+
+
+async def set_cached_canvas_state(version: Optional[int], payload: bytes) -> None:
+    """
+    Guarda el estado del canvas serializado en la caché.
+    
+    Args:
+        version: La versión devuelta por get_cached_canvas_state()
+        payload: El JSON del estado del canvas, tal como se envía al cliente
+    """
+    if redis_client is None or version is None:
+        return
+    
+    try:
+        await redis_client.set(
+            _canvas_state_key(version),
+            payload,
+            ex=CANVAS_STATE_TTL_SECONDS
+        )
+    except redis.RedisError:
+        pass
+
+
+async def invalidate_canvas_state() -> None:
+    """
+    Invalida el estado del canvas cacheado.
+    
+    Debe llamarse DESPUÉS de hacer commit de un píxel nuevo. Incrementar la
+    versión hace que la siguiente lectura busque una clave que aún no existe.
+    """
+    if redis_client is None:
+        return
+    
+    try:
+        await redis_client.incr(CANVAS_VERSION_KEY)
+    except redis.RedisError:
+        pass
+
+
+async def bulk_import_events(db: AsyncSession, rows: List[Tuple[int, int, int, UUID, datetime]]) -> int:
+    """
+    Importa eventos con crud.bulk_import_events y actualiza la caché.
+    
+    Es la función que hay que usar para importar: crud no puede tocar la caché
+    (este módulo importa crud, no al revés). Después del commit invalida el estado
+    del canvas y borra el contador total y la marca de usuarios activos, para que
+    la próxima lectura los recalcule en PostgreSQL con los eventos importados.
+    
+    Args:
+        db: Sesión de base de datos
+        rows: Lista de tuplas (x, y, color, user_id, created_at), ver crud.bulk_import_events
+    
+    Returns:
+        Número de eventos importados
+    """
+    imported = await crud.bulk_import_events(db, rows)
+    
+    if imported:
+        await invalidate_canvas_state()
+        
+        if redis_client is not None:
+            try:
+                await redis_client.delete(PIXELS_TOTAL_KEY, ACTIVE_USERS_SEEDED_KEY)
+            except redis.RedisError:
+                pass
+    
+    return imported
+
+
+def _active_users_key(hour: datetime) -> str:
+    """Construye la clave del HyperLogLog de usuarios activos de una hora (UTC)."""
+    return f"{ACTIVE_USERS_KEY_PREFIX}{hour:%Y%m%d%H}"
+
+
+def _active_users_keys(now: datetime) -> List[str]:
+    """Claves de los buckets horarios que cubren la ventana de usuarios activos."""
+    return [
+        _active_users_key(now - timedelta(hours=hours_ago))
+        for hours_ago in range(ACTIVE_USERS_WINDOW_HOURS)
+    ]
+
+
+async def record_pixels_placed(user_id: UUID, pixel_count: int = 1) -> None:
+    """
+    Actualiza los contadores de estadísticas después de pintar píxeles.
+    
+    Debe llamarse DESPUÉS de hacer commit. Incrementa el total de píxeles y
+    agrega al usuario al HyperLogLog de la hora actual. Un HyperLogLog cuenta
+    elementos únicos de forma aproximada (~0.8% de error) usando solo 12KB,
+    sin importar cuántos usuarios haya.
+    
+    Args:
+        user_id: Identificador del usuario
+        pixel_count: Cuántos píxeles se pintaron
+    """
+    if redis_client is None:
+        return
+    
+    bucket_key = _active_users_key(datetime.utcnow())
+    
+    try:
+        # pipeline() agrupa los comandos en un solo viaje a Redis
+        pipe = redis_client.pipeline()
+        pipe.eval(_INCR_IF_EXISTS_SCRIPT, 1, PIXELS_TOTAL_KEY, pixel_count)
+        pipe.pfadd(bucket_key, str(user_id))
+        pipe.expire(bucket_key, ACTIVE_USERS_BUCKET_TTL_SECONDS)
+        await pipe.execute()
+    except redis.RedisError:
+        pass
+
+
+async def get_total_pixels_count(db: AsyncSession) -> int:
+    """
+    Obtiene el número total de píxeles pintados.
+    
+    Lee el contador de Redis; si no existe (Redis recién iniciado o contador
+    expirado) lo inicializa con un COUNT en PostgreSQL. Sin Redis, siempre
+    cuenta en PostgreSQL.
+    
+    Args:
+        db: Sesión de base de datos (para inicializar el contador)
+    
+    Returns:
+        Número total de píxeles pintados
+    """
+    if redis_client is None:
+        return await crud.get_total_pixels_count(db)
+    
+    try:
+        total = await redis_client.get(PIXELS_TOTAL_KEY)
+        if total is not None:
+            return int(total)
+        
+        total = await crud.get_total_pixels_count(db)
+        # nx=True: si otra petición ya lo inicializó (o ya se incrementó), no pisarlo
+        await redis_client.set(PIXELS_TOTAL_KEY, total, nx=True, ex=PIXELS_TOTAL_TTL_SECONDS)
+        return total
+    except redis.RedisError:
+        return await crud.get_total_pixels_count(db)
+
+
+async def get_active_users_count(db: AsyncSession) -> int:
+    """
+    Cuenta usuarios que han pintado en las últimas 24 horas.
+    
+    Hace un PFCOUNT sobre los buckets horarios de las últimas 24 horas, que une
+    los HyperLogLogs y estima los usuarios únicos sin recorrer pixel_events. La
+    primera vez (Redis vacío) llena los buckets a partir de PostgreSQL.
+    
+    Args:
+        db: Sesión de base de datos (para inicializar los buckets)
+    
+    Returns:
+        Número aproximado de usuarios únicos activos
+    """
+    if redis_client is None:
+        return await crud.get_active_users_count(db, since_hours=ACTIVE_USERS_WINDOW_HOURS)
+    
+    try:
+        if not await redis_client.exists(ACTIVE_USERS_SEEDED_KEY):
+            await _seed_active_users(db)
+        
+        return await redis_client.pfcount(*_active_users_keys(datetime.utcnow()))
+    except redis.RedisError:
+        return await crud.get_active_users_count(db, since_hours=ACTIVE_USERS_WINDOW_HOURS)
+
+
+async def _seed_active_users(db: AsyncSession) -> None:
+    """
+    Llena los HyperLogLogs horarios con la actividad reciente de PostgreSQL.
+    
+    Solo se ejecuta cuando Redis no tiene datos (por ejemplo, tras reiniciarlo).
+    PFADD es idempotente, así que no importa si dos peticiones lo hacen a la vez.
+    """
+    pipe = redis_client.pipeline()
+    
+    users_by_hour = await crud.get_active_users_by_hour(db, ACTIVE_USERS_WINDOW_HOURS)
+    
+    for hour, user_ids in users_by_hour.items():
+        bucket_key = _active_users_key(hour)
+        pipe.pfadd(bucket_key, *[str(user_id) for user_id in user_ids])
+        pipe.expire(bucket_key, ACTIVE_USERS_BUCKET_TTL_SECONDS)
+    
+    # La marca dura lo mismo que la ventana: después de eso todos los buckets
+    # necesarios ya se llenaron con record_pixels_placed()
+    pipe.set(ACTIVE_USERS_SEEDED_KEY, 1, ex=ACTIVE_USERS_WINDOW_HOURS * 3600)
+    await pipe.execute()
@@ -6,22 +6,47 @@ Separar estas operaciones en su propio archivo hace el código más organizado y
 
 Las funciones aquí reciben una sesión de SQLAlchemy y retornan objetos de modelos
 o datos procesados. No manejan HTTP directamente, eso es responsabilidad de los endpoints.
+
+Los colores se manejan siempre como enteros RGB (0xRRGGBB), igual que en la BD.
+La conversión desde/hacia '#RRGGBB' se hace en schemas.py, en el borde de la API.
+
+Todas son corutinas (async def): la sesión es asíncrona, así que mientras PostgreSQL
+responde, el event loop puede seguir atendiendo otras peticiones.
+
+Las consultas de lectura más frecuentes se construyen una sola vez, al importar el
+módulo (constantes _MAYUSCULAS), con bindparam() para los valores que cambian en
+cada petición. Así no se rearma el árbol de la consulta en cada llamada, y como la
+sentencia es siempre la misma, SQLAlchemy encuentra su SQL ya compilado en la caché
+del engine.
 """
 
-from sqlalchemy.orm import Session
-from sqlalchemy import func, desc
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import bindparam, func, desc, literal, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from datetime import datetime, timedelta
 from typing import List, Optional, Dict, Tuple
+from uuid import UUID
 from . import models
 
 
-def get_current_canvas_state(db: Session, width: int, height: int) -> Dict[Tuple[int, int], dict]:
+# Todas las filas del estado actual del canvas
+_CANVAS_STATE = select(models.PixelCurrent)
+
+# Solo coordenadas y color, para el buffer binario
+_CANVAS_COLORS = select(
+    models.PixelCurrent.x,
+    models.PixelCurrent.y,
+    models.PixelCurrent.color
+)
+
+
+async def get_current_canvas_state(db: AsyncSession, width: int, height: int) -> Dict[Tuple[int, int], dict]:
     """
     Obtiene el estado actual completo del canvas.
     
-    Esta función construye el canvas desde cero leyendo el historial de eventos
-    y tomando el último evento para cada coordenada. Es relativamente costosa
-    computacionalmente, por eso en el futuro podríamos agregar caché en Redis.
+    Lee la tabla pixel_current, que ya tiene una fila por coordenada con el
+    último evento. No hace falta recorrer el historial de eventos: el costo
+    depende del tamaño del canvas, no de cuántos píxeles se han pintado.
     
     Args:
         db: Sesión activa de SQLAlchemy
@@ -32,44 +57,134 @@ def get_current_canvas_state(db: Session, width: int, height: int) -> Dict[Tuple
         Diccionario donde la clave es (x, y) y el valor es un dict con
         información del píxel: {color, user_id, timestamp}
     """
-    # Subconsulta para obtener el ID del evento más reciente para cada coordenada
-    # Esta es una técnica SQL común llamada "grouped maximum" o "latest record per group"
-    subquery = (
-        db.query(
-            models.PixelEvent.x,
-            models.PixelEvent.y,
-            func.max(models.PixelEvent.id).label('max_id')
-        )
-        .group_by(models.PixelEvent.x, models.PixelEvent.y)
-        .subquery()
-    )
-    
-    # Query principal que obtiene los eventos completos usando los IDs de la subconsulta
-    # JOIN con la subconsulta para obtener solo los eventos más recientes
-    latest_pixels = (
-        db.query(models.PixelEvent)
-        .join(
-            subquery,
-            (models.PixelEvent.x == subquery.c.x) &
-            (models.PixelEvent.y == subquery.c.y) &
-            (models.PixelEvent.id == subquery.c.max_id)
-        )
-        .all()
-    )
+    current_pixels = (await db.scalars(_CANVAS_STATE)).all()
     
     # Construir el diccionario del canvas
     canvas_state = {}
-    for pixel in latest_pixels:
+    for pixel in current_pixels:
         canvas_state[(pixel.x, pixel.y)] = {
             'color': pixel.color,
             'user_id': pixel.user_id,
-            'timestamp': pixel.created_at.isoformat()
+            'timestamp': pixel.updated_at.isoformat()
         }
     
     return canvas_state
 
 
-def get_pixel_at(db: Session, x: int, y: int) -> Optional[dict]:
+async def get_canvas_rgba(db: AsyncSession, width: int, height: int) -> bytes:
+    """
+    Obtiene el estado actual del canvas como un buffer binario RGBA.
+    
+    El buffer tiene width * height celdas de 4 bytes (R, G, B, A) en orden
+    row-major: la celda (x, y) empieza en el byte (y * width + x) * 4. Las
+    celdas sin pintar quedan en cero (alpha 0 = transparente).
+    
+    Es el mismo formato que usa ImageData en el navegador, así que el frontend
+    puede usar los bytes directamente sin parsear JSON ni colores hex.
+    
+    Args:
+        db: Sesión de base de datos
+        width: Ancho del canvas en píxeles
+        height: Alto del canvas en píxeles
+    
+    Returns:
+        Los bytes RGBA del canvas (width * height * 4 bytes)
+    """
+    buffer = bytearray(width * height * 4)
+    
+    # Solo necesitamos coordenadas y color, no construimos objetos del ORM
+    current_pixels = (await db.execute(_CANVAS_COLORS)).all()
+    
+    for x, y, color in current_pixels:
+        # Ignorar píxeles fuera del canvas (por ejemplo si se redujo su tamaño)
+        if x >= width or y >= height:
+            continue
+        
+        offset = (y * width + x) * 4
+        # color es el entero 0xRRGGBB: to_bytes lo parte en sus 3 bytes R, G, B
+        buffer[offset:offset + 3] = color.to_bytes(3, 'big')
+        buffer[offset + 3] = 255
+    
+    return bytes(buffer)
+
+
+async def rebuild_pixel_current(db: AsyncSession) -> None:
+    """
+    Reconstruye la tabla pixel_current a partir del historial de pixel_events.
+    
+    En operación normal pixel_current se mantiene al día con cada píxel pintado,
+    pero esta función sirve para poblarla en una base de datos que ya tenía
+    eventos antes de que existiera la tabla, o para repararla si se desincroniza.
+    Se ejecuta con el script rebuild_pixel_current.py (en la carpeta backend/).
+    
+    Args:
+        db: Sesión de base de datos
+    """
+    # DISTINCT ON (x, y) se queda con la primera fila de cada coordenada según el
+    # ORDER BY, así que ordenando por id descendente obtenemos el evento más reciente.
+    # Es la forma idiomática de PostgreSQL para el "latest record per group": con el
+    # índice (x, y, id DESC) se resuelve en un solo recorrido, sin GROUP BY ni JOIN.
+    latest_events = (
+        select(
+            models.PixelEvent.x,
+            models.PixelEvent.y,
+            models.PixelEvent.color,
+            models.PixelEvent.user_id,
+            models.PixelEvent.created_at,
+            models.PixelEvent.id
+        )
+        .distinct(models.PixelEvent.x, models.PixelEvent.y)
+        .order_by(
+            models.PixelEvent.x,
+            models.PixelEvent.y,
+            desc(models.PixelEvent.id)
+        )
+    )
+    
+    stmt = pg_insert(models.PixelCurrent).from_select(
+        ['x', 'y', 'color', 'user_id', 'updated_at', 'event_id'],
+        latest_events
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['x', 'y'],
+        set_={
+            'color': stmt.excluded.color,
+            'user_id': stmt.excluded.user_id,
+            'updated_at': stmt.excluded.updated_at,
+            'event_id': stmt.excluded.event_id
+        },
+        # Nunca reemplazar un evento más nuevo que el que ya tiene la fila
+        # (ver el mismo filtro en create_pixel_events)
+        where=models.PixelCurrent.event_id < stmt.excluded.event_id
+    )
+    
+    await db.execute(stmt)
+    await db.commit()
+
+
+# Evento más reciente de una coordenada
+# Ordenamos por id: es autoincremental, así que sigue el mismo orden que
+# created_at, pero es un entero y ya está en el índice (x, y, id DESC)
+# Solo pedimos columnas incluidas en el índice (x, y, id DESC) para que
+# PostgreSQL pueda responder con un Index Only Scan sin leer la tabla
+_PIXEL_AT = (
+    select(
+        models.PixelEvent.x,
+        models.PixelEvent.y,
+        models.PixelEvent.color,
+        models.PixelEvent.user_id,
+        models.PixelEvent.created_at
+    )
+    .where(
+        models.PixelEvent.x == bindparam('x'),
+        models.PixelEvent.y == bindparam('y')
+    )
+    .order_by(desc(models.PixelEvent.id))
+    .limit(1)
+)
+
+
+async def get_pixel_at(db: AsyncSession, x: int, y: int) -> Optional[dict]:
     """
     Obtiene el estado actual de un píxel específico.
     
@@ -82,14 +197,8 @@ def get_pixel_at(db: Session, x: int, y: int) -> Optional[dict]:
         Dict con información del píxel o None si nunca se ha pintado
     """
     # Buscar el evento más reciente para estas coordenadas
-    # order_by(desc()) ordena del más reciente al más antiguo
     # first() retorna el primer resultado o None si no hay resultados
-    latest_event = (
-        db.query(models.PixelEvent)
-        .filter(models.PixelEvent.x == x, models.PixelEvent.y == y)
-        .order_by(desc(models.PixelEvent.created_at))
-        .first()
-    )
+    latest_event = (await db.execute(_PIXEL_AT, {'x': x, 'y': y})).first()
     
     if not latest_event:
         return None
@@ -103,12 +212,12 @@ def get_pixel_at(db: Session, x: int, y: int) -> Optional[dict]:
     }
 
 
-def create_pixel_event(
-    db: Session,
+async def create_pixel_event(
+    db: AsyncSession,
     x: int,
     y: int,
-    color: str,
-    user_id: str
+    color: int,
+    user_id: UUID
 ) -> models.PixelEvent:
     """
     Crea un nuevo evento de píxel en la base de datos.
@@ -116,44 +225,281 @@ def create_pixel_event(
     Esta función registra que un usuario pintó un píxel en una posición específica.
     No valida coordenadas ni cooldowns, eso debe hacerse antes de llamar esta función.
     
+    También actualiza el estado actual del canvas y las estadísticas del usuario
+    (ver create_pixel_events). No hace commit: el endpoint hace commit al final.
+    
     Args:
         db: Sesión de base de datos
         x: Coordenada X (debe estar validada previamente)
         y: Coordenada Y (debe estar validada previamente)
-        color: Color en formato hex (debe estar validado previamente)
+        color: Color como entero RGB (ya convertido por el esquema de la petición)
+        user_id: Identificador del usuario
+    
+    Returns:
+        El objeto PixelEvent recién creado (no queda asociado a la sesión),
+        con el color como entero
+    """
+    return (await create_pixel_events(db, [(x, y, color)], user_id))[0]
+
+
+async def create_pixel_events(
+    db: AsyncSession,
+    pixels: List[Tuple[int, int, int]],
+    user_id: UUID
+) -> List[models.PixelEvent]:
+    """
+    Crea varios eventos de píxel de un mismo usuario con un solo statement.
+    
+    En el mismo statement actualiza pixel_current y las estadísticas del usuario
+    (total de píxeles y último píxel, que usa el cooldown), creándolo si no existe.
+    
+    Igual que create_pixel_event, no valida coordenadas ni cooldowns y no
+    hace commit. Los eventos se insertan en el orden recibido, así que si el
+    lote pinta dos veces la misma coordenada, el último color es el que queda.
+    
+    Args:
+        db: Sesión de base de datos
+        pixels: Lista de tuplas (x, y, color) ya validadas, con el color como entero RGB
         user_id: Identificador del usuario
     
     Returns:
-        El objeto PixelEvent recién creado
+        Los objetos PixelEvent recién creados, en el mismo orden que pixels
+        (no quedan asociados a la sesión), con el color como entero
+    """
+    # Todo se hace en UN solo statement con CTEs que modifican datos
+    # ("writable CTEs" de PostgreSQL), en un solo viaje a la BD:
+    #
+    #   WITH inserted_events AS (INSERT INTO pixel_events ... RETURNING ...),
+    #        latest_events   AS (SELECT DISTINCT ON (x, y) ... FROM inserted_events),
+    #        upsert_current  AS (INSERT INTO pixel_current ... ON CONFLICT DO UPDATE),
+    #        upsert_user     AS (INSERT INTO users ... ON CONFLICT DO UPDATE)
+    #   SELECT ... FROM inserted_events
+    #
+    # Es atómico aunque no haya commit todavía: o se aplican los tres cambios o ninguno
+    
+    # Un solo INSERT con múltiples VALUES en vez de un INSERT por píxel
+    # RETURNING nos devuelve el id y el created_at sin un SELECT adicional
+    # created_at lo asigna PostgreSQL con el server_default (now()) del modelo
+    rows = [
+        {'x': x, 'y': y, 'color': color, 'user_id': user_id}
+        for x, y, color in pixels
+    ]
+    inserted_events = (
+        pg_insert(models.PixelEvent)
+        .values(rows)
+        .returning(
+            models.PixelEvent.id,
+            models.PixelEvent.x,
+            models.PixelEvent.y,
+            models.PixelEvent.color,
+            models.PixelEvent.user_id,
+            models.PixelEvent.created_at
+        )
+        .cte('inserted_events')
+    )
+    
+    # Si el lote repite una coordenada nos quedamos con el último evento:
+    # ON CONFLICT no permite actualizar la misma fila dos veces en un statement
+    latest_events = (
+        select(
+            inserted_events.c.x,
+            inserted_events.c.y,
+            inserted_events.c.color,
+            inserted_events.c.user_id,
+            inserted_events.c.created_at,
+            inserted_events.c.id
+        )
+        .distinct(inserted_events.c.x, inserted_events.c.y)
+        .order_by(inserted_events.c.x, inserted_events.c.y, desc(inserted_events.c.id))
+    )
+    
+    # Actualizar el estado actual de cada coordenada
+    # ON CONFLICT convierte el INSERT en UPDATE si la coordenada ya estaba pintada
+    upsert_current = pg_insert(models.PixelCurrent).from_select(
+        ['x', 'y', 'color', 'user_id', 'updated_at', 'event_id'],
+        latest_events
+    )
+    upsert_current = upsert_current.on_conflict_do_update(
+        index_elements=['x', 'y'],
+        set_={
+            'color': upsert_current.excluded.color,
+            'user_id': upsert_current.excluded.user_id,
+            'updated_at': upsert_current.excluded.updated_at,
+            'event_id': upsert_current.excluded.event_id
+        },
+        # Solo actualizar si el evento nuevo es posterior al guardado. Dos transacciones
+        # que pintan la misma coordenada pueden tomar el bloqueo de la fila en orden
+        # distinto al de sus ids: sin este filtro el evento 10 podría pisar al 11, y
+        # pixel_current mostraría otro color que el historial (que ordena por id)
+        where=models.PixelCurrent.event_id < upsert_current.excluded.event_id
+    )
+    
+    # Actualizar las estadísticas del usuario (o crearlo si es nuevo)
+    # last_pixel_at toma el created_at que PostgreSQL asignó a los eventos
+    user_stats = select(
+        literal(user_id, models.User.id.type),
+        func.count(),
+        func.max(inserted_events.c.created_at)
+    ).select_from(inserted_events)
+    
+    upsert_user = pg_insert(models.User).from_select(
+        ['id', 'total_pixels_placed', 'last_pixel_at'],
+        user_stats
+    )
+    upsert_user = upsert_user.on_conflict_do_update(
+        index_elements=['id'],
+        set_={
+            'total_pixels_placed': models.User.total_pixels_placed + upsert_user.excluded.total_pixels_placed,
+            'last_pixel_at': upsert_user.excluded.last_pixel_at
+        }
+    )
+    
+    # add_cte() agrega los CTE de pixel_current y users aunque el SELECT final no
+    # los lea: PostgreSQL ejecuta siempre los CTE que modifican datos
+    inserted = (await db.execute(
+        select(inserted_events)
+        .add_cte(upsert_current.cte('upsert_current'), upsert_user.cte('upsert_user'))
+    )).all()
+    
+    # PostgreSQL no garantiza el orden de RETURNING; los ids sí siguen el orden
+    # de los VALUES, así que ordenamos por id para recuperar el orden original
+    # y construimos los objetos en memoria con los valores que devolvió la BD
+    pixel_events = [
+        models.PixelEvent(
+            id=row.id,
+            x=row.x,
+            y=row.y,
+            color=row.color,
+            user_id=row.user_id,
+            created_at=row.created_at
+        )
+        for row in sorted(inserted, key=lambda row: row.id)
+    ]
+    
+    return pixel_events
+
+
+# A partir de cuántas filas conviene usar COPY en vez de un INSERT normal
+# Para pocas filas el costo de preparar el COPY no compensa
+BULK_IMPORT_COPY_THRESHOLD = 100
+
+
+async def bulk_import_events(
+    db: AsyncSession,
+    rows: List[Tuple[int, int, int, UUID, datetime]]
+) -> int:
+    """
+    Importa muchos eventos de píxel de una vez (por ejemplo un canvas histórico
+    o datos de prueba).
+    
+    Para lotes grandes usa COPY ... FROM STDIN de PostgreSQL, que envía las filas
+    como un flujo de datos en vez de parámetros de un INSERT y es varias veces
+    más rápido. Para lotes pequeños usa un INSERT con múltiples VALUES.
+    
+    Al terminar reconstruye pixel_current y hace commit. Como el estado actual se
+    decide por id, los eventos importados cuentan como los más recientes: está
+    pensado para importar a un canvas vacío o datos más nuevos que los existentes.
+    No actualiza las estadísticas de los usuarios ni la caché de Redis: para
+    importar se usa cache.bulk_import_events, que llama a esta función y después
+    invalida la caché. Para importar eventos de meses pasados, sus particiones
+    deben existir antes (ver database.ensure_pixel_event_partitions).
+    
+    Args:
+        db: Sesión de base de datos
+        rows: Lista de tuplas (x, y, color, user_id, created_at) ya validadas,
+            con el color como entero RGB y created_at como datetime con zona horaria
+    
+    Returns:
+        Número de eventos importados
     """
-    # Crear instancia del modelo
-    pixel_event = models.PixelEvent(
-        x=x,
-        y=y,
-        color=color,
-        user_id=user_id,
-        # created_at se asigna automáticamente por el default en el modelo
+    if not rows:
+        return 0
+    
+    if len(rows) >= BULK_IMPORT_COPY_THRESHOLD:
+        # db.connection() nos da la conexión de la sesión, y driver_connection
+        # la conexión de asyncpg que hay debajo de SQLAlchemy
+        connection = await db.connection()
+        
+        # El driver de SQLAlchemy para asyncpg recién envía el BEGIN con la primera
+        # consulta. Si usáramos la conexión de asyncpg antes, el COPY quedaría en su
+        # propia transacción y se confirmaría solo, antes de rebuild_pixel_current.
+        # Este SELECT abre la transacción de la sesión: el COPY queda dentro de ella
+        # y la importación completa se guarda junta en el commit (o no se guarda)
+        await connection.exec_driver_sql("SELECT 1")
+        raw_connection = (await connection.get_raw_connection()).driver_connection
+        
+        # copy_records_to_table() usa el protocolo COPY en formato binario
+        await raw_connection.copy_records_to_table(
+            models.PixelEvent.__tablename__,
+            records=rows,
+            columns=['x', 'y', 'color', 'user_id', 'created_at']
+        )
+    else:
+        await db.execute(
+            pg_insert(models.PixelEvent).values([
+                {'x': x, 'y': y, 'color': color, 'user_id': user_id, 'created_at': created_at}
+                for x, y, color, user_id, created_at in rows
+            ])
+        )
+    
+    # Sincronizar el estado actual del canvas con los eventos importados
+    # (rebuild_pixel_current hace el commit de todo)
+    await rebuild_pixel_current(db)
+    
+    return len(rows)
+
+
+# Eventos de una coordenada, del más reciente al más antiguo
+_PIXEL_HISTORY = (
+    select(
+        models.PixelEvent.id,
+        models.PixelEvent.color,
+        models.PixelEvent.user_id,
+        models.PixelEvent.created_at
+    )
+    .where(
+        models.PixelEvent.x == bindparam('x'),
+        models.PixelEvent.y == bindparam('y')
     )
+    .order_by(desc(models.PixelEvent.id))
+    .limit(bindparam('limit'))
+)
+
+# La misma consulta para las páginas siguientes: solo eventos anteriores al cursor
+# Es una sentencia aparte (y no un "id < :before_id OR :before_id IS NULL") para que
+# PostgreSQL siempre pueda usar el índice (x, y, id DESC) como rango
+_PIXEL_HISTORY_BEFORE = _PIXEL_HISTORY.where(models.PixelEvent.id < bindparam('before_id'))
+
+
+def _next_cursor(ids: List[int], limit: int) -> Optional[int]:
+    """
+    Calcula el cursor de la página siguiente (paginación "keyset").
     
-    # Agregar a la sesión (esto aún no escribe en la BD)
-    db.add(pixel_event)
+    En vez de OFFSET (que obliga a PostgreSQL a leer y descartar todas las filas
+    anteriores), la página siguiente pide "id < cursor": el índice salta directo
+    al punto donde quedamos, sin importar cuántas páginas llevemos.
     
-    # Hacer commit para guardar en PostgreSQL
-    # Si hay algún error, SQLAlchemy automáticamente hace rollback
-    db.commit()
+    Args:
+        ids: Los ids de la página actual, del más reciente al más antiguo
+        limit: El tamaño de página que se pidió
     
-    # Refrescar el objeto para obtener valores asignados por la BD (como el ID)
-    db.refresh(pixel_event)
+    Returns:
+        El id del último evento de la página, o None si no hay más páginas
+    """
+    # Una página vacía o incompleta significa que ya no quedan más eventos
+    if not ids or len(ids) < limit:
+        return None
     
-    return pixel_event
+    return ids[-1]
 
 
-def get_pixel_history(
-    db: Session,
+async def get_pixel_history(
+    db: AsyncSession,
     x: int,
     y: int,
-    limit: int = 50
-) -> List[dict]:
+    limit: int = 50,
+    before_id: Optional[int] = None
+) -> Tuple[List[dict], Optional[int]]:
     """
     Obtiene el historial de cambios de un píxel específico.
     
@@ -164,19 +510,21 @@ def get_pixel_history(
         x: Coordenada X
         y: Coordenada Y
         limit: Máximo número de eventos a retornar (por defecto 50)
+        before_id: Cursor de la página anterior; solo retorna eventos con id menor
     
     Returns:
-        Lista de eventos ordenados del más reciente al más antiguo
+        Tupla de (eventos, siguiente_cursor)
+        - eventos: Lista ordenada del más reciente al más antiguo
+        - siguiente_cursor: Valor de before_id para la página siguiente (None si no hay más)
     """
-    events = (
-        db.query(models.PixelEvent)
-        .filter(models.PixelEvent.x == x, models.PixelEvent.y == y)
-        .order_by(desc(models.PixelEvent.created_at))
-        .limit(limit)
-        .all()
-    )
+    if before_id is None:
+        stmt, params = _PIXEL_HISTORY, {'x': x, 'y': y, 'limit': limit}
+    else:
+        stmt, params = _PIXEL_HISTORY_BEFORE, {'x': x, 'y': y, 'limit': limit, 'before_id': before_id}
+    
+    events = (await db.execute(stmt, params)).all()
     
-    return [
+    history = [
         {
             'color': event.color,
             'user_id': event.user_id,
@@ -184,9 +532,26 @@ def get_pixel_history(
         }
         for event in events
     ]
+    
+    return history, _next_cursor([event.id for event in events], limit)
+
+
+# Últimos eventos de todo el canvas (usa la clave primaria, ya ordenada por id)
+_RECENT_PIXELS = (
+    select(models.PixelEvent)
+    .order_by(desc(models.PixelEvent.id))
+    .limit(bindparam('limit'))
+)
+
+# Páginas siguientes de los eventos recientes (ver _PIXEL_HISTORY_BEFORE)
+_RECENT_PIXELS_BEFORE = _RECENT_PIXELS.where(models.PixelEvent.id < bindparam('before_id'))
 
 
-def get_recent_pixels(db: Session, limit: int = 100) -> List[dict]:
+async def get_recent_pixels(
+    db: AsyncSession,
+    limit: int = 100,
+    before_id: Optional[int] = None
+) -> Tuple[List[dict], Optional[int]]:
     """
     Obtiene los píxeles pintados más recientemente en todo el canvas.
     
@@ -195,18 +560,21 @@ def get_recent_pixels(db: Session, limit: int = 100) -> List[dict]:
     Args:
         db: Sesión de base de datos
         limit: Número de píxeles recientes a retornar
+        before_id: Cursor de la página anterior; solo retorna eventos con id menor
     
     Returns:
-        Lista de eventos de píxeles ordenados del más reciente al más antiguo
+        Tupla de (eventos, siguiente_cursor)
+        - eventos: Lista ordenada del más reciente al más antiguo
+        - siguiente_cursor: Valor de before_id para la página siguiente (None si no hay más)
     """
-    recent = (
-        db.query(models.PixelEvent)
-        .order_by(desc(models.PixelEvent.created_at))
-        .limit(limit)
-        .all()
-    )
+    if before_id is None:
+        stmt, params = _RECENT_PIXELS, {'limit': limit}
+    else:
+        stmt, params = _RECENT_PIXELS_BEFORE, {'limit': limit, 'before_id': before_id}
+    
+    recent = (await db.scalars(stmt, params)).all()
     
-    return [
+    pixels = [
         {
             'x': event.x,
             'y': event.y,
@@ -216,68 +584,11 @@ def get_recent_pixels(db: Session, limit: int = 100) -> List[dict]:
         }
         for event in recent
     ]
-
-
-def get_or_create_user(db: Session, user_id: str) -> models.User:
-    """
-    Busca un usuario por ID, o lo crea si no existe.
-    
-    Este patrón "get or create" es muy común en aplicaciones web.
-    Garantiza que siempre tendremos un registro de usuario válido.
-    
-    Args:
-        db: Sesión de base de datos
-        user_id: Identificador del usuario
-    
-    Returns:
-        El objeto User existente o recién creado
-    """
-    # Intentar buscar el usuario primero
-    user = db.query(models.User).filter(models.User.id == user_id).first()
-    
-    # Si existe, retornarlo
-    if user:
-        return user
-    
-    # Si no existe, crear uno nuevo
-    new_user = models.User(
-        id=user_id,
-        username=None,  # Por ahora los usuarios son anónimos
-        total_pixels_placed=0,
-        last_pixel_at=None
-    )
-    
-    db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
-    
-    return new_user
-
-
-def update_user_pixel_stats(db: Session, user_id: str) -> None:
-    """
-    Actualiza las estadísticas de un usuario después de pintar un píxel.
     
-    Incrementa el contador de píxeles totales y actualiza el timestamp
-    del último píxel pintado.
-    
-    Args:
-        db: Sesión de base de datos
-        user_id: Identificador del usuario
-    """
-    user = get_or_create_user(db, user_id)
-    
-    # Incrementar contador
-    user.total_pixels_placed += 1
-    
-    # Actualizar timestamp
-    user.last_pixel_at = datetime.utcnow()
-    
-    # Guardar cambios
-    db.commit()
+    return pixels, _next_cursor([event.id for event in recent], limit)
 
 
-def get_user_stats(db: Session, user_id: str) -> Optional[dict]:
+async def get_user_stats(db: AsyncSession, user_id: UUID) -> Optional[dict]:
     """
     Obtiene estadísticas de un usuario específico.
     
@@ -288,7 +599,7 @@ def get_user_stats(db: Session, user_id: str) -> Optional[dict]:
     Returns:
         Dict con estadísticas del usuario o None si no existe
     """
-    user = db.query(models.User).filter(models.User.id == user_id).first()
+    user = await db.get(models.User, user_id)
     
     if not user:
         return None
@@ -302,17 +613,17 @@ def get_user_stats(db: Session, user_id: str) -> Optional[dict]:
     }
 
 
-def get_total_pixels_count(db: Session) -> int:
+async def get_total_pixels_count(db: AsyncSession) -> int:
     """
     Cuenta el número total de píxeles pintados en todo el canvas.
     
     Returns:
         Número total de eventos de píxeles en la base de datos
     """
-    return db.query(func.count(models.PixelEvent.id)).scalar()
+    return await db.scalar(select(func.count(models.PixelEvent.id)))
 
 
-def get_active_users_count(db: Session, since_hours: int = 24) -> int:
+async def get_active_users_count(db: AsyncSession, since_hours: int = 24) -> int:
     """
     Cuenta usuarios que han pintado al menos un píxel en las últimas X horas.
     
@@ -323,13 +634,47 @@ def get_active_users_count(db: Session, since_hours: int = 24) -> int:
     Returns:
         Número de usuarios únicos activos
     """
-    cutoff_time = datetime.utcnow() - timedelta(hours=since_hours)
+    # El límite se calcula en PostgreSQL con now(), el mismo reloj que asigna
+    # created_at, así no mezclamos horas de Python con horas de la BD
+    cutoff_time = func.now() - timedelta(hours=since_hours)
     
     # COUNT(DISTINCT user_id) cuenta usuarios únicos
-    count = (
-        db.query(func.count(func.distinct(models.PixelEvent.user_id)))
-        .filter(models.PixelEvent.created_at >= cutoff_time)
-        .scalar()
+    # El filtro por created_at usa el índice BRIN brin_pixel_created
+    count = await db.scalar(
+        select(func.count(func.distinct(models.PixelEvent.user_id)))
+        .where(models.PixelEvent.created_at >= cutoff_time)
     )
     
-    return count
\ No newline at end of file
+    return count
+
+
+async def get_active_users_by_hour(db: AsyncSession, since_hours: int = 24) -> Dict[datetime, List[UUID]]:
+    """
+    Agrupa los usuarios que pintaron en las últimas X horas por hora (UTC).
+    
+    Se usa para inicializar los contadores de usuarios activos en Redis.
+    
+    Args:
+        db: Sesión de base de datos
+        since_hours: Ventana de tiempo en horas (por defecto 24)
+    
+    Returns:
+        Diccionario donde la clave es la hora (truncada) y el valor es la lista
+        de usuarios únicos que pintaron en esa hora
+    """
+    cutoff_time = func.now() - timedelta(hours=since_hours)
+    # timezone('UTC', ...) pasa el TIMESTAMPTZ a hora UTC sin zona antes de truncar;
+    # si no, date_trunc usaría la zona horaria de la sesión de PostgreSQL
+    hour = func.date_trunc('hour', func.timezone('UTC', models.PixelEvent.created_at))
+    
+    rows = (await db.execute(
+        select(hour, models.PixelEvent.user_id)
+        .where(models.PixelEvent.created_at >= cutoff_time)
+        .distinct()
+    )).all()
+    
+    users_by_hour = {}
+    for bucket, user_id in rows:
+        users_by_hour.setdefault(bucket, []).append(user_id)
+    
+    return users_by_hour
@@ -5,34 +5,61 @@ Este es el punto de entrada de la aplicación. Define todos los endpoints HTTP
 que los clientes pueden llamar para interactuar con el canvas.
 """
 
-from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi import FastAPI, Depends, HTTPException, Query, WebSocket, WebSocketDisconnect, status
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, ORJSONResponse, Response
 from sqlalchemy import text
-from sqlalchemy.orm import Session
-from typing import List
+from sqlalchemy.ext.asyncio import AsyncSession
+from contextlib import asynccontextmanager, suppress
+from typing import List, Optional
+import asyncio
 import os
+import time
+import orjson
 from dotenv import load_dotenv
 
-from . import crud, models, schemas
-from .database import get_db, engine
+from . import cache, crud, models, realtime, schemas
+from .database import SessionLocal, engine, get_db, ensure_pixel_event_partitions, maintain_pixel_event_partitions, redis_client
 from .rate_limiter import RateLimiter
 
 # Cargar variables de entorno
 load_dotenv()
 
-# Crear las tablas en la base de datos si no existen
-# Esto se ejecuta automáticamente cuando arranca la aplicación
-# En producción usaríamos Alembic en su lugar, pero para el MVP esto funciona bien
-models.Base.metadata.create_all(bind=engine)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Código que se ejecuta al arrancar (antes del yield) y al apagar la aplicación.
+    """
+    # Las tablas las crean las migraciones de Alembic ("alembic upgrade head"),
+    # no la API. Aquí solo creamos las particiones de pixel_events del mes actual
+    # y de los próximos meses (si faltan las tablas, la API no arranca)
+    async with engine.begin() as connection:
+        await ensure_pixel_event_partitions(connection)
+    partitions = asyncio.create_task(maintain_pixel_event_partitions())
+    
+    # Con Redis, escuchar en segundo plano los píxeles que pintan los demás
+    # procesos de la API para reenviarlos a los WebSockets de este proceso
+    listener = asyncio.create_task(realtime.listen_for_pixels()) if redis_client else None
+    
+    yield
+    
+    partitions.cancel()
+    if listener is not None:
+        listener.cancel()
+
 
 # Crear la instancia de la aplicación FastAPI
 app = FastAPI(
+    # ORJSONResponse serializa las respuestas con orjson (escrito en C),
+    # bastante más rápido que el módulo json estándar para listas de píxeles
+    default_response_class=ORJSONResponse,
     title="Pixel Canvas Lite API",
     description="API para un canvas colaborativo de píxeles en tiempo real",
     version="1.0.0",
     docs_url="/docs",  # Documentación interactiva en /docs
     redoc_url="/redoc",  # Documentación alternativa en /redoc
+    lifespan=lifespan,
 )
 
 # Configurar CORS (Cross-Origin Resource Sharing)
@@ -46,6 +73,9 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],  # Permite GET, POST, PUT, DELETE, etc.
     allow_headers=["*"],  # Permite todos los headers HTTP
+    # Headers de la respuesta que el JavaScript de otro origen puede leer
+    # (por defecto el navegador solo expone unos pocos, como Content-Type)
+    expose_headers=["X-Next-Cursor"],
 )
 
 # Obtener configuración del canvas desde variables de entorno
@@ -55,7 +85,8 @@ PIXEL_COOLDOWN_SECONDS = int(os.getenv("PIXEL_COOLDOWN_SECONDS", "30"))
 
 # Instancia global del rate limiter
 # Esta instancia se comparte entre todas las peticiones
-rate_limiter = RateLimiter(cooldown_seconds=PIXEL_COOLDOWN_SECONDS)
+# Con Redis configurado, el cooldown se verifica en Redis en vez de PostgreSQL
+rate_limiter = RateLimiter(cooldown_seconds=PIXEL_COOLDOWN_SECONDS, redis_client=redis_client)
 
 
 @app.get("/", tags=["General"])
@@ -80,7 +111,7 @@ async def root():
     response_model=schemas.CanvasInfoResponse,
     tags=["Canvas"]
 )
-async def get_canvas_info(db: Session = Depends(get_db)):
+async def get_canvas_info(db: AsyncSession = Depends(get_db)):
     """
     Obtiene información general del canvas sin retornar todos los píxeles.
     
@@ -91,8 +122,10 @@ async def get_canvas_info(db: Session = Depends(get_db)):
         Información del canvas: dimensiones, total de píxeles pintados,
         usuarios activos, y tiempo de cooldown.
     """
-    total_pixels = crud.get_total_pixels_count(db)
-    active_users = crud.get_active_users_count(db, since_hours=24)
+    # Ambos contadores salen de Redis (O(1)) y solo consultan PostgreSQL
+    # para inicializarse o si Redis no está disponible
+    total_pixels = await cache.get_total_pixels_count(db)
+    active_users = await cache.get_active_users_count(db)
     
     return schemas.CanvasInfoResponse(
         width=CANVAS_WIDTH,
@@ -108,40 +141,139 @@ async def get_canvas_info(db: Session = Depends(get_db)):
     response_model=schemas.CanvasStateResponse,
     tags=["Canvas"]
 )
-async def get_canvas_state(db: Session = Depends(get_db)):
+async def get_canvas_state(db: AsyncSession = Depends(get_db)):
     """
     Obtiene el estado completo actual del canvas.
     
     Este endpoint retorna todos los píxeles que han sido pintados.
     Para un canvas de 32x32, esto podría ser hasta 1,024 píxeles.
     
-    El frontend debe llamar este endpoint una vez al cargar la página
-    para obtener el estado inicial, y luego actualizarse con WebSocket
-    (que implementaremos después) o polling.
+    El frontend no necesita llamar a este endpoint periódicamente: el WebSocket
+    /ws/canvas envía este mismo estado al conectarse y luego solo los cambios.
     
     Returns:
         Estado completo del canvas con todos los píxeles pintados.
     """
-    canvas_state = crud.get_current_canvas_state(db, CANVAS_WIDTH, CANVAS_HEIGHT)
+    payload = await _get_canvas_state_payload(db)
+    
+    return Response(content=payload, media_type="application/json")
+
+
+async def _get_canvas_state_payload(db: AsyncSession) -> bytes:
+    """
+    Retorna el estado completo del canvas ya serializado como JSON.
+    
+    Lo usan tanto /api/canvas/state como el WebSocket /ws/canvas.
+    """
+    # Primero intentar servir el estado desde la caché de Redis
+    # En un cache hit no tocamos PostgreSQL ni volvemos a serializar nada
+    version, cached_payload = await cache.get_cached_canvas_state()
+    
+    if cached_payload is not None:
+        return cached_payload
     
-    # Convertir el diccionario a una lista de PixelInfo
+    canvas_state = await crud.get_current_canvas_state(db, CANVAS_WIDTH, CANVAS_HEIGHT)
+    
+    # Construir la respuesta con dicts simples en vez de modelos PixelInfo:
+    # los datos vienen de la BD, no hace falta validarlos campo por campo
     pixels = [
-        schemas.PixelInfo(
-            x=x,
-            y=y,
-            color=pixel_data['color'],
-            user_id=pixel_data['user_id'],
-            timestamp=pixel_data['timestamp']
-        )
+        {
+            'x': x,
+            'y': y,
+            'color': schemas.format_hex_color(pixel_data['color']),
+            'user_id': pixel_data['user_id'],
+            'timestamp': pixel_data['timestamp']
+        }
         for (x, y), pixel_data in canvas_state.items()
     ]
     
-    return schemas.CanvasStateResponse(
-        width=CANVAS_WIDTH,
-        height=CANVAS_HEIGHT,
-        pixels=pixels,
-        total_pixels=len(pixels)
-    )
+    response = {
+        'width': CANVAS_WIDTH,
+        'height': CANVAS_HEIGHT,
+        'pixels': pixels,
+        'total_pixels': len(pixels)
+    }
+    
+    # Serializar una sola vez con orjson y guardar el resultado en la caché
+    payload = orjson.dumps(response)
+    await cache.set_cached_canvas_state(version, payload)
+    
+    return payload
+
+
+@app.websocket("/ws/canvas")
+async def canvas_websocket(websocket: WebSocket):
+    """
+    WebSocket con las actualizaciones del canvas en tiempo real.
+    
+    Al conectarse, el cliente recibe el estado completo del canvas (el mismo JSON
+    de /api/canvas/state, dentro de un mensaje "state"). Después recibe un mensaje
+    "pixels" cada vez que alguien pinta. Ver realtime.py para el formato.
+    
+    El cliente no necesita enviar nada: solo escuchar.
+    """
+    await websocket.accept()
+    
+    # Registrarse antes de leer el estado para no perder píxeles pintados mientras tanto
+    queue = realtime.subscribe()
+    forwarder = None
+    
+    try:
+        # Sesión corta solo para leer el estado: no retenemos una conexión del pool
+        # durante toda la vida del WebSocket (que puede durar horas)
+        async with SessionLocal() as db:
+            payload = await _get_canvas_state_payload(db)
+        
+        await websocket.send_text(realtime.state_message(payload))
+        
+        # Reenviar los píxeles nuevos en segundo plano mientras esperamos a que
+        # el cliente cierre la conexión
+        forwarder = asyncio.create_task(realtime.forward_events(websocket, queue))
+        while True:
+            # receive() y no receive_text(): un frame binario no tiene "text" y
+            # receive_text() fallaría con KeyError. Lo que envíe el cliente se ignora
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+    except WebSocketDisconnect:
+        pass
+    finally:
+        realtime.unsubscribe(queue)
+        if forwarder is not None:
+            # Esperamos a que la tarea termine y descartamos su error (por ejemplo, si
+            # send_text falló porque el cliente ya se fue). Sin el await, asyncio
+            # avisaría "Task exception was never retrieved"
+            forwarder.cancel()
+            with suppress(asyncio.CancelledError, Exception):
+                await forwarder
+
+
+@app.get(
+    "/api/canvas/state.bin",
+    response_class=Response,
+    responses={
+        200: {
+            "content": {"application/octet-stream": {}},
+            "description": "Buffer RGBA de CANVAS_WIDTH * CANVAS_HEIGHT * 4 bytes",
+        }
+    },
+    tags=["Canvas"]
+)
+async def get_canvas_state_binary(db: AsyncSession = Depends(get_db)):
+    """
+    Obtiene el estado completo actual del canvas en formato binario.
+    
+    Alternativa compacta a /api/canvas/state: en vez de un objeto JSON por píxel,
+    retorna 4 bytes (R, G, B, A) por celda en orden row-major. Las celdas sin
+    pintar tienen alpha 0. El frontend puede copiar los bytes directamente a un
+    ImageData. Las dimensiones se obtienen de /api/canvas/info.
+    
+    Returns:
+        Buffer binario RGBA con el estado del canvas.
+    """
+    content = await crud.get_canvas_rgba(db, CANVAS_WIDTH, CANVAS_HEIGHT)
+    
+    return Response(content=content, media_type="application/octet-stream")
 
 
 @app.get(
@@ -152,7 +284,7 @@ async def get_canvas_state(db: Session = Depends(get_db)):
 async def get_pixel(
     x: int,
     y: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Obtiene información de un píxel específico.
@@ -175,7 +307,7 @@ async def get_pixel(
             detail=f"Coordenadas fuera de rango. El canvas es {CANVAS_WIDTH}x{CANVAS_HEIGHT}"
         )
     
-    pixel = crud.get_pixel_at(db, x, y)
+    pixel = await crud.get_pixel_at(db, x, y)
     
     if not pixel:
         raise HTTPException(
@@ -183,7 +315,8 @@ async def get_pixel(
             detail=f"El píxel en ({x}, {y}) nunca ha sido pintado"
         )
     
-    return schemas.PixelInfo(**pixel)
+    # model_construct() crea el modelo sin volver a validar datos que ya vienen de la BD
+    return schemas.PixelInfo.model_construct(**pixel)
 
 
 @app.post(
@@ -194,7 +327,7 @@ async def get_pixel(
 )
 async def place_pixel(
     pixel_request: schemas.PixelPlaceRequest,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     # En una aplicación real, obtendríamos el user_id de un token de autenticación
     # Por ahora usamos un placeholder
     user_id: str = "anonymous_user"
@@ -220,6 +353,9 @@ async def place_pixel(
     y = pixel_request.y
     color = pixel_request.color
     
+    # En la BD los usuarios se identifican por UUID (ver schemas.user_uuid)
+    user_id = schemas.user_uuid(user_id)
+    
     # Validar que las coordenadas estén dentro del canvas
     if x < 0 or x >= CANVAS_WIDTH or y < 0 or y >= CANVAS_HEIGHT:
         raise HTTPException(
@@ -237,7 +373,7 @@ async def place_pixel(
         )
     
     # Verificar cooldown del usuario
-    can_place, cooldown_remaining = rate_limiter.check_rate_limit(user_id, db)
+    can_place, cooldown_remaining = await rate_limiter.check_rate_limit(user_id, db)
     
     if not can_place:
         raise HTTPException(
@@ -252,7 +388,8 @@ async def place_pixel(
         )
     
     # Crear el evento de píxel en la base de datos
-    pixel_event = crud.create_pixel_event(
+    # El mismo statement actualiza el estado actual del canvas y las estadísticas del usuario
+    pixel_event = await crud.create_pixel_event(
         db=db,
         x=x,
         y=y,
@@ -260,22 +397,134 @@ async def place_pixel(
         user_id=user_id
     )
     
-    # Actualizar estadísticas del usuario
-    crud.update_user_pixel_stats(db, user_id)
-    
     # Registrar que este usuario acaba de pintar un píxel (para el cooldown)
-    rate_limiter.record_pixel_placement(user_id, db)
+    await rate_limiter.record_pixel_placement(user_id, db)
+    
+    # Un solo commit para todo: el evento, el estado actual del canvas y las
+    # estadísticas del usuario se guardan juntos o no se guarda nada
+    await db.commit()
+    
+    # El canvas cambió: la próxima lectura del estado debe recalcularse
+    await cache.invalidate_canvas_state()
+    await cache.record_pixels_placed(user_id)
+    
+    # Avisar a los clientes conectados por WebSocket
+    await realtime.publish_pixels([pixel_event])
     
     return schemas.PixelPlaceResponse(
         success=True,
         message="Píxel pintado exitosamente",
-        pixel={
-            "x": pixel_event.x,
-            "y": pixel_event.y,
-            "color": pixel_event.color,
-            "user_id": pixel_event.user_id,
-            "timestamp": pixel_event.created_at.isoformat()
-        },
+        pixel=_pixel_info(pixel_event),
+        cooldown_remaining=PIXEL_COOLDOWN_SECONDS
+    )
+
+
+def _pixel_info(pixel_event: models.PixelEvent) -> schemas.PixelInfo:
+    """
+    Construye el PixelInfo de un evento recién creado, para la respuesta.
+    
+    model_construct() no vuelve a validar: los datos acaban de salir de la BD.
+    """
+    return schemas.PixelInfo.model_construct(
+        x=pixel_event.x,
+        y=pixel_event.y,
+        color=pixel_event.color,
+        user_id=pixel_event.user_id,
+        timestamp=pixel_event.created_at.isoformat()
+    )
+
+
+@app.post(
+    "/api/pixels/batch",
+    response_model=schemas.PixelPlaceBatchResponse,
+    status_code=status.HTTP_201_CREATED,
+    tags=["Pixels"]
+)
+async def place_pixels_batch(
+    batch_request: schemas.PixelPlaceBatchRequest,
+    db: AsyncSession = Depends(get_db),
+    # Igual que en place_pixel, por ahora usamos un placeholder
+    user_id: str = "anonymous_user"
+):
+    """
+    Pinta varios píxeles en el canvas con una sola petición.
+    
+    Pensado para cuando el usuario arrastra el pincel. Todos los píxeles se
+    guardan en una sola transacción: o se pintan todos o ninguno.
+    
+    El cooldown se cobra por píxel: pintar N píxeles requiere que hayan pasado
+    N cooldowns desde el último píxel del usuario.
+    
+    Args:
+        batch_request: Lista de píxeles a pintar (x, y, color)
+        user_id: Identificador del usuario (por ahora hardcoded)
+    
+    Returns:
+        Confirmación de los píxeles pintados con información del cooldown
+    
+    Raises:
+        400: Si alguna coordenada está fuera de rango
+        429: Si el usuario no ha esperado lo suficiente para pintar todo el lote
+    """
+    pixels = batch_request.pixels
+    user_id = schemas.user_uuid(user_id)
+    
+    # Validar que todas las coordenadas estén dentro del canvas
+    for pixel in pixels:
+        if pixel.x >= CANVAS_WIDTH or pixel.y >= CANVAS_HEIGHT:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail={
+                    "error": "INVALID_COORDINATES",
+                    "message": f"Coordenadas fuera de rango. El canvas es {CANVAS_WIDTH}x{CANVAS_HEIGHT}",
+                    "details": {
+                        "max_x": CANVAS_WIDTH - 1,
+                        "max_y": CANVAS_HEIGHT - 1,
+                        "received_x": pixel.x,
+                        "received_y": pixel.y
+                    }
+                }
+            )
+    
+    # Verificar el cooldown de todo el lote con una sola consulta
+    can_place, cooldown_remaining = await rate_limiter.check_batch(user_id, len(pixels), db)
+    
+    if not can_place:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail={
+                "error": "COOLDOWN_ACTIVE",
+                "message": f"Debes esperar {cooldown_remaining} segundos antes de pintar {len(pixels)} píxeles",
+                "details": {
+                    "cooldown_remaining": cooldown_remaining
+                }
+            }
+        )
+    
+    # Crear todos los eventos, el estado actual y las estadísticas con un solo statement
+    pixel_events = await crud.create_pixel_events(
+        db=db,
+        pixels=[(pixel.x, pixel.y, pixel.color) for pixel in pixels],
+        user_id=user_id
+    )
+    
+    # Registrar que este usuario acaba de pintar (para el cooldown)
+    await rate_limiter.record_pixel_placement(user_id, db)
+    
+    # Un solo commit para todo el lote
+    await db.commit()
+    
+    # El canvas cambió: la próxima lectura del estado debe recalcularse
+    await cache.invalidate_canvas_state()
+    await cache.record_pixels_placed(user_id, len(pixel_events))
+    
+    # Avisar a los clientes conectados por WebSocket
+    await realtime.publish_pixels(pixel_events)
+    
+    return schemas.PixelPlaceBatchResponse(
+        success=True,
+        message=f"{len(pixel_events)} píxeles pintados exitosamente",
+        pixels=[_pixel_info(pixel_event) for pixel_event in pixel_events],
         cooldown_remaining=PIXEL_COOLDOWN_SECONDS
     )
 
@@ -286,8 +535,10 @@ async def place_pixel(
     tags=["Pixels"]
 )
 async def get_recent_pixels(
-    limit: int = 100,
-    db: Session = Depends(get_db)
+    # ge=1: con limit=0 no habría página ni cursor que devolver
+    limit: int = Query(100, ge=1),
+    before_id: Optional[int] = None,
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Obtiene los píxeles pintados más recientemente.
@@ -295,8 +546,12 @@ async def get_recent_pixels(
     Útil para mostrar un feed de actividad reciente o para actualizar
     el canvas sin tener que cargar todo el estado.
     
+    Para ver más, se pide la página siguiente con before_id igual al valor del
+    header X-Next-Cursor de la respuesta (el header no está si no hay más páginas).
+    
     Args:
         limit: Número máximo de píxeles a retornar (por defecto 100)
+        before_id: Cursor de paginación (el X-Next-Cursor de la página anterior)
     
     Returns:
         Lista de píxeles ordenados del más reciente al más antiguo
@@ -305,9 +560,21 @@ async def get_recent_pixels(
     if limit > 500:
         limit = 500
     
-    recent_pixels = crud.get_recent_pixels(db, limit=limit)
+    recent_pixels, next_cursor = await crud.get_recent_pixels(db, limit=limit, before_id=before_id)
+    
+    # La respuesta es una lista, así que el cursor va en un header
+    headers = {"X-Next-Cursor": str(next_cursor)} if next_cursor is not None else None
     
-    return [schemas.PixelInfo(**pixel) for pixel in recent_pixels]
+    # model_construct() crea los modelos sin volver a validar datos que ya vienen de la BD,
+    # y el TypeAdapter serializa toda la lista de una vez (ver schemas.PIXEL_INFO_LIST_ADAPTER).
+    # Al retornar un Response, FastAPI lo envía tal cual sin volver a procesarlo
+    pixels = [schemas.PixelInfo.model_construct(**pixel) for pixel in recent_pixels]
+    
+    return Response(
+        content=schemas.PIXEL_INFO_LIST_ADAPTER.dump_json(pixels),
+        media_type="application/json",
+        headers=headers
+    )
 
 
 @app.get(
@@ -318,8 +585,9 @@ async def get_recent_pixels(
 async def get_pixel_history(
     x: int,
     y: int,
-    limit: int = 50,
-    db: Session = Depends(get_db)
+    limit: int = Query(50, ge=1),
+    before_id: Optional[int] = None,
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Obtiene el historial completo de un píxel específico.
@@ -327,10 +595,14 @@ async def get_pixel_history(
     Muestra todos los cambios que ha tenido un píxel a lo largo del tiempo.
     Útil para ver "guerras" de píxeles o estadísticas de una coordenada.
     
+    El historial se pagina con un cursor: para la página siguiente se pide
+    before_id igual al next_cursor de la respuesta.
+    
     Args:
         x: Coordenada X
         y: Coordenada Y
         limit: Máximo de eventos históricos a retornar
+        before_id: Cursor de paginación (el next_cursor de la página anterior)
     
     Returns:
         Historial de cambios ordenado del más reciente al más antiguo
@@ -342,13 +614,17 @@ async def get_pixel_history(
             detail=f"Coordenadas fuera de rango"
         )
     
-    history = crud.get_pixel_history(db, x, y, limit=limit)
+    history, next_cursor = await crud.get_pixel_history(db, x, y, limit=limit, before_id=before_id)
     
-    return schemas.PixelHistoryResponse(
+    # Los colores siguen como enteros: PixelHistoryEntry los serializa como '#RRGGBB'
+    history = [schemas.PixelHistoryEntry.model_construct(**entry) for entry in history]
+    
+    return schemas.PixelHistoryResponse.model_construct(
         x=x,
         y=y,
         history=history,
-        total_changes=len(history)
+        total_changes=len(history),
+        next_cursor=next_cursor
     )
 
 
@@ -359,13 +635,13 @@ async def get_pixel_history(
 )
 async def get_user_stats(
     user_id: str,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Obtiene estadísticas de un usuario específico.
     
     Args:
-        user_id: Identificador del usuario
+        user_id: Identificador del usuario (el mismo que se usó al pintar, o su UUID)
     
     Returns:
         Estadísticas del usuario: píxeles pintados, último píxel, etc.
@@ -373,7 +649,7 @@ async def get_user_stats(
     Raises:
         404: Si el usuario no existe
     """
-    stats = crud.get_user_stats(db, user_id)
+    stats = await crud.get_user_stats(db, schemas.user_uuid(user_id))
     
     if not stats:
         raise HTTPException(
@@ -384,26 +660,49 @@ async def get_user_stats(
     return schemas.UserStatsResponse(**stats)
 
 
+# Cada cuántos segundos el health check vuelve a hacer ping a la BD
+# Entre pings se responde con el último resultado guardado
+HEALTH_CHECK_INTERVAL_SECONDS = 5
+
+# Último ping a la BD: (momento según time.monotonic(), resultado)
+# -inf garantiza que el primer health check siempre haga el ping
+_last_health_check = (float("-inf"), "unknown")
+
+
 @app.get(
     "/api/health",
     tags=["General"]
 )
-async def health_check(db: Session = Depends(get_db)):
+async def health_check():
     """
     Health check endpoint.
     
     Verifica que la aplicación y la base de datos estén funcionando correctamente.
     Útil para monitoreo y balanceadores de carga.
     
+    Los balanceadores pueden llamar a este endpoint varias veces por segundo, así
+    que no abre una sesión por petición: hace un ping a la BD como mucho cada
+    HEALTH_CHECK_INTERVAL_SECONDS y mientras tanto reutiliza el último resultado.
+    
     Returns:
         Estado del sistema
     """
-    try:
-        # Intentar hacer una query simple a la BD para verificar conectividad
-        db.execute(text("SELECT 1"))
-        db_status = "healthy"
-    except Exception as e:
-        db_status = f"unhealthy: {str(e)}"
+    global _last_health_check
+    
+    last_check_at, db_status = _last_health_check
+    
+    # time.monotonic() no salta si se cambia la hora del sistema
+    if time.monotonic() - last_check_at > HEALTH_CHECK_INTERVAL_SECONDS:
+        try:
+            # Intentar hacer una query simple a la BD para verificar conectividad
+            # Usamos el engine directamente: no hace falta una sesión del ORM
+            async with engine.connect() as connection:
+                await connection.execute(text("SELECT 1"))
+            db_status = "healthy"
+        except Exception as e:
+            db_status = f"unhealthy: {str(e)}"
+        
+        _last_health_check = (time.monotonic(), db_status)
     
     return {
         "status": "healthy" if db_status == "healthy" else "degraded",
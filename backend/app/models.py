@@ -1,13 +1,13 @@
 """
 Modelos de la base de datos usando SQLAlchemy ORM.
 
-Cada clase aquí representa una tabla en PostgreSQL. SQLAlchemy automáticamente
-crea las tablas basándose en estas definiciones cuando ejecutamos el script
-de inicialización de la base de datos.
+Cada clase aquí representa una tabla en PostgreSQL. Las tablas se crean con las
+migraciones de Alembic (carpeta alembic/): cuando cambies un modelo, genera una
+migración nueva con "alembic revision --autogenerate" y revísala.
 """
 
-from datetime import datetime
-from sqlalchemy import Column, Integer, String, DateTime, Index
+from sqlalchemy import Column, BigInteger, Integer, SmallInteger, String, DateTime, Index, func
+from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import declarative_base
 
 # Base es la clase padre de todos nuestros modelos.
@@ -30,10 +30,16 @@ class PixelEvent(Base):
     # Columnas de la tabla
     # Column() define cada campo, especificando el tipo de dato y restricciones
 
-    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    # BigInteger: BIGINT de 64 bits. Con INTEGER (32 bits) el máximo es ~2.100 millones
+    # de eventos, y como nunca borramos eventos un canvas popular podría llegar ahí
     # primary_key=True: Esta columna identifica únicamente cada fila
-    # index=True: PostgreSQL crea un índice para búsquedas rápidas por ID
-    # autoincrement=True: PostgreSQL asigna automáticamente números secuenciales
+    # Sin index=True: PostgreSQL ya crea un índice para la clave primaria (id, created_at),
+    # y como id es su primera columna también sirve para buscar solo por id.
+    # Un índice aparte sobre id sería otro B-tree que actualizar en cada INSERT
+    # autoincrement=True: PostgreSQL asigna automáticamente números secuenciales (BIGSERIAL)
+    # No usamos Identity(): PostgreSQL 15 no permite columnas identity en tablas
+    # particionadas (se agregó en PostgreSQL 17)
 
     x = Column(Integer, nullable=False)
     # nullable=False: Este campo es obligatorio, no puede ser NULL
@@ -43,34 +49,67 @@ class PixelEvent(Base):
     # nullable=False: Este campo es obligatorio, no puede ser NULL
     # Representa la coordenada Y del píxel (0 a CANVAS_HEIGHT-1)
 
-    color = Column(String(7), nullable=False)
+    color = Column(Integer, nullable=False)
     # nullable=False: Este campo es obligatorio, no puede ser NULL
-    # Representa el color del píxel en formato hex (por ejemplo, '#FF0000' para rojo)
+    # Representa el color del píxel como un entero RGB de 24 bits (0xRRGGBB)
+    # Por ejemplo '#FF0000' (rojo) se guarda como 0xFF0000 = 16711680
+    # Un INTEGER ocupa 4 bytes fijos, contra 8 de un VARCHAR(7) (7 + 1 de cabecera),
+    # así caben más filas por página y no hay que crear un string por fila al leer.
+    # La conversión desde/hacia '#RRGGBB' se hace en schemas.py, en el borde de la API
 
-    user_id = Column(String(100), nullable=False)
-    # Por ahora usamos un simple string para identificar usuarios
-    # En el futuro podríamos cambiarlo a UUID cuando implementemos autenticación real
-    # String(100): Suficientemente largo para IPs hasheadas o identificadores de sesión
+    user_id = Column(UUID(as_uuid=True), nullable=False)
+    # UUID: 16 bytes fijos, en vez de un string de largo variable
+    # Los identificadores que recibe la API (IDs de sesión, IPs hasheadas...) se
+    # convierten a UUID con schemas.user_uuid() antes de llegar aquí
+    # as_uuid=True: en Python el valor es un uuid.UUID, no un string
 
-    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
-    # DateTime: Timestamp de cuándo se pintó el píxel
-    # default=datetime.utcnow: Si no especificamos un valor, usa la hora actual en UTC
-    # Usamos UTC en vez de hora local para evitar problemas con zonas horarias
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), primary_key=True)
+    # DateTime(timezone=True): TIMESTAMPTZ, se guarda en UTC y se lee con zona horaria
+    # server_default=func.now(): PostgreSQL pone la hora al insertar la fila (DEFAULT now()),
+    # así Python no calcula nada y todas las instancias de la API usan el mismo reloj
+    # now() es la hora de inicio de la transacción: los píxeles de un lote comparten timestamp
+    # primary_key=True: la tabla está particionada por created_at (ver __table_args__) y
+    # PostgreSQL exige que la clave primaria incluya la columna de partición.
+    # La clave queda (id, created_at); id sigue siendo único por sí solo (viene de una secuencia)
     
     # Índices compuestos para consultas comunes
     # Un índice compuesto permite búsquedas rápidas por múltiples columnas a la vez
     __table_args__ = (
-    # Índice para buscar todos los eventos de un píxel específico
-    # Útil para queries como "muéstrame el historial del píxel en (10, 20)"
-    Index('idx_pixel_coords', 'x', 'y'),
-    
-    # Índice para buscar píxeles por usuario
-    # Útil para queries como "muéstrame todos los píxeles que pintó este usuario"
-    Index('idx_user_id', 'user_id'),
+    # Índice para buscar todos los eventos de un píxel específico, del más reciente
+    # al más antiguo. Útil para queries como "muéstrame el historial del píxel en (10, 20)"
+    # y para el "DISTINCT ON (x, y) ... ORDER BY x, y, id DESC" que reconstruye el canvas.
+    # Ordenamos por id y no por created_at: id es autoincremental (mismo orden) y
+    # comparar enteros es más barato que comparar timestamps.
+    # INCLUDE agrega el resto de columnas a las hojas del índice ("covering index"), así
+    # esas consultas se resuelven solo con el índice, ya ordenado y sin leer la tabla.
+    # Sus primeras columnas también sirven para búsquedas que solo filtran por (x, y)
+    Index(
+        'idx_pixel_coords_id_desc',
+        'x', 'y', id.desc(),
+        postgresql_include=['color', 'user_id', 'created_at']
+    ),
+
+    # Índice para buscar píxeles por usuario, del más reciente al más antiguo
+    # Útil para queries como "muéstrame los últimos píxeles que pintó este usuario":
+    # WHERE user_id = ? ORDER BY created_at DESC LIMIT N se resuelve recorriendo el
+    # índice en orden, sin ordenar. Por la regla del prefijo izquierdo también sirve
+    # para búsquedas que solo filtran por user_id
+    Index('idx_user_created', 'user_id', created_at.desc()),
     
-    # Índice para ordenar por fecha
-    # Útil para queries como "muéstrame los últimos 100 píxeles pintados"
-    Index('idx_created_at', 'created_at'),
+    # Índice BRIN para filtrar por fecha
+    # Útil para queries como "¿cuántos usuarios pintaron en las últimas 24 horas?"
+    # (los "últimos 100 píxeles pintados" se ordenan por id y usan la clave primaria)
+    # La tabla es append-only y created_at siempre crece, así que las filas quedan
+    # físicamente ordenadas por fecha. Un BRIN solo guarda el mínimo y máximo de cada
+    # rango de bloques: ocupa unos KB en vez de MB y casi no encarece los INSERT
+    Index('brin_pixel_created', 'created_at', postgresql_using='brin'),
+
+    # Particionado por rango de created_at: una partición (tabla hija) por mes,
+    # por ejemplo pixel_events_2025_01. Ver ensure_pixel_event_partitions en database.py
+    # Cada partición tiene sus propios índices, así que los del mes actual (los que
+    # se usan todo el tiempo) se mantienen pequeños y en memoria, y los meses viejos
+    # se pueden separar (DETACH PARTITION) y archivar sin un DELETE masivo ni VACUUM
+    {'postgresql_partition_by': 'RANGE (created_at)'},
 )
 
     def __repr__(self):
@@ -91,9 +130,8 @@ class User(Base):
     """
     __tablename__ = "users"
     
-    id = Column(String(100), primary_key=True)
-    # Usamos el mismo identificador que en PixelEvent.user_id
-    # Podría ser una IP hasheada, un ID de sesión, o eventualmente un UUID
+    id = Column(UUID(as_uuid=True), primary_key=True)
+    # Usamos el mismo identificador que en PixelEvent.user_id (ver schemas.user_uuid)
     
     username = Column(String(50), unique=True, nullable=True)
     # username es opcional (nullable=True) porque usuarios anónimos no lo tendrán
@@ -103,12 +141,48 @@ class User(Base):
     # Contador de cuántos píxeles ha pintado este usuario en total
     # default=0: Los usuarios nuevos empiezan en cero
     
-    last_pixel_at = Column(DateTime, nullable=True)
-    # Timestamp del último píxel pintado
+    last_pixel_at = Column(DateTime(timezone=True), nullable=True)
+    # Timestamp del último píxel pintado (TIMESTAMPTZ, igual que pixel_events.created_at)
     # Útil para calcular si el usuario puede pintar de nuevo (cooldown)
+    # No lleva onupdate: lo asigna crud.create_pixel_events con el created_at del
+    # evento, y no debe cambiar si se actualiza otra columna (como username)
     
-    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
-    # Cuándo se creó el registro del usuario
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    # Cuándo se creó el registro del usuario (lo asigna PostgreSQL, ver PixelEvent.created_at)
     
     def __repr__(self):
-        return f"<User(id={self.id}, username={self.username}, pixels={self.total_pixels_placed})>"
\ No newline at end of file
+        return f"<User(id={self.id}, username={self.username}, pixels={self.total_pixels_placed})>"
+
+
+class PixelCurrent(Base):
+    """
+    Tabla con el estado actual del canvas: una fila por coordenada pintada.
+
+    Es una "vista materializada" de pixel_events que mantenemos sincronizada a mano:
+    cada vez que se pinta un píxel hacemos un UPSERT aquí en la misma transacción
+    que el INSERT del evento. Así leer el canvas completo cuesta como mucho
+    CANVAS_WIDTH * CANVAS_HEIGHT filas, sin importar cuán largo sea el historial.
+    """
+    __tablename__ = "pixel_current"
+
+    x = Column(SmallInteger, primary_key=True)
+    y = Column(SmallInteger, primary_key=True)
+    # La clave primaria compuesta (x, y) garantiza una sola fila por coordenada
+    # y es la que usa el ON CONFLICT del UPSERT
+    # SMALLINT (2 bytes, hasta 32767) alcanza para cualquier tamaño de canvas razonable
+    # y hace más chicas tanto las filas como las entradas de la clave primaria
+
+    color = Column(Integer, nullable=False)
+    # Color del último evento en esta coordenada (entero RGB, igual que en PixelEvent)
+
+    user_id = Column(UUID(as_uuid=True), nullable=False)
+    # Usuario que pintó el último evento
+
+    updated_at = Column(DateTime(timezone=True), nullable=False)
+    # Timestamp del último evento (el created_at de pixel_events, con zona horaria)
+
+    event_id = Column(BigInteger, nullable=False)
+    # ID del último evento en pixel_events, útil para depurar o reconstruir
+
+    def __repr__(self):
+        return f"<PixelCurrent(x={self.x}, y={self.y}, color={self.color}, event_id={self.event_id})>"
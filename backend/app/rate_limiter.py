@@ -2,15 +2,54 @@
 Sistema de rate limiting (cooldown) para píxeles.
 
 Controla con qué frecuencia los usuarios pueden pintar píxeles.
-Implementa un cooldown simple basado en timestamps en la base de datos.
+Implementa un cooldown simple basado en el timestamp del último píxel.
 
-En una versión más avanzada, esto se haría con Redis para mejor rendimiento,
-pero para el MVP usar la base de datos PostgreSQL es suficiente.
+Si Redis está configurado, el cooldown se verifica ahí con un script Lua atómico:
+es una operación en memoria, sin consultas ni bloqueos sobre la tabla users en
+cada intento de pintar. Sin Redis (o si no responde) se usa users.last_pixel_at
+en PostgreSQL, que se sigue actualizando en cada píxel pintado.
 """
 
-from datetime import datetime, timedelta
-from sqlalchemy.orm import Session
-from typing import Tuple
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional, Tuple
+from uuid import UUID
+import math
+import redis
+import redis.asyncio
+
+from .schemas import MAX_PIXELS_PER_BATCH
+
+# Prefijo de la clave de Redis con el último píxel de cada usuario
+COOLDOWN_KEY_PREFIX = "cooldown:"
+
+# Script Lua: verifica el cooldown y, si el usuario puede pintar, registra el
+# momento actual como su último píxel. Al ser un script, Redis lo ejecuta de forma
+# atómica: dos peticiones simultáneas del mismo usuario no pueden pasar las dos.
+# Usa la hora del servidor de Redis (TIME) para que todas las instancias de la
+# API compartan el mismo reloj.
+#   KEYS[1] = clave del usuario
+#   ARGV[1] = segundos que deben haber pasado desde el último píxel
+#   ARGV[2] = máximo de segundos acumulables, y tiempo de vida de la clave
+# Sin clave (usuario nuevo o inactivo) cuenta como el máximo acumulable
+# Retorna 0 si puede pintar, o los segundos que le faltan esperar
+_CHECK_COOLDOWN_SCRIPT = """
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local max_banked = tonumber(ARGV[2])
+local elapsed = max_banked
+local last = redis.call('GET', KEYS[1])
+if last then
+    elapsed = math.min(now - tonumber(last), max_banked)
+end
+local remaining = tonumber(ARGV[1]) - elapsed
+if remaining > 0 then
+    return math.max(1, math.floor(remaining))
+end
+redis.call('SET', KEYS[1], tostring(now), 'EX', max_banked)
+return 0
+"""
 
 
 class RateLimiter:
@@ -22,18 +61,39 @@ class RateLimiter:
     
     Attributes:
         cooldown_seconds: Tiempo de espera entre píxeles (en segundos)
+        redis_client: Cliente de Redis para el cooldown (None = usar PostgreSQL)
     """
     
-    def __init__(self, cooldown_seconds: int = 30):
+    def __init__(self, cooldown_seconds: int = 30, redis_client: Optional[redis.asyncio.Redis] = None):
         """
         Inicializa el rate limiter.
         
         Args:
             cooldown_seconds: Segundos de espera entre píxeles (default: 30)
+            redis_client: Cliente asíncrono de Redis (opcional)
         """
         self.cooldown_seconds = cooldown_seconds
+        self.redis_client = redis_client
+        
+        # El cooldown como timedelta, calculado una sola vez: en PostgreSQL
+        # comparamos timedeltas directamente, sin pasar por segundos en float
+        self._cooldown_td = timedelta(seconds=cooldown_seconds)
+        
+        # register_script() envía el script con EVALSHA (solo su hash) y lo carga
+        # en Redis automáticamente la primera vez
+        self._check_cooldown_script = (
+            redis_client.register_script(_CHECK_COOLDOWN_SCRIPT) if redis_client else None
+        )
+        
+        # Máximo de tiempo que un usuario puede "ahorrar" sin pintar: un lote completo
+        # Sin este tope, un usuario nuevo o que estuvo inactivo podría pintar cualquier
+        # cantidad de píxeles de golpe, mucho más rápido que de uno en uno
+        # Es también el tiempo de vida de la clave de Redis: pasado ese tiempo la
+        # clave ya no cambia nada, porque el crédito no puede crecer más
+        self._max_banked_seconds = cooldown_seconds * MAX_PIXELS_PER_BATCH
+        self._max_banked_td = timedelta(seconds=self._max_banked_seconds)
     
-    def check_rate_limit(self, user_id: str, db: Session) -> Tuple[bool, int]:
+    async def check_rate_limit(self, user_id: UUID, db: AsyncSession) -> Tuple[bool, int]:
         """
         Verifica si un usuario puede pintar un píxel ahora.
         
@@ -49,29 +109,99 @@ class RateLimiter:
             - puede_pintar: True si el usuario puede pintar ahora
             - segundos_restantes: Segundos que debe esperar (0 si puede pintar)
         """
-        from .models import User
+        return await self.check_batch(user_id, 1, db)
+    
+    async def check_batch(self, user_id: UUID, pixel_count: int, db: AsyncSession) -> Tuple[bool, int]:
+        """
+        Verifica si un usuario puede pintar un lote de píxeles ahora.
+        
+        Cada píxel "cuesta" un cooldown: para pintar N píxeles de una vez deben
+        haber pasado N cooldowns desde el último píxel del usuario. El tiempo
+        acumulado sin pintar tiene un tope de MAX_PIXELS_PER_BATCH cooldowns, así
+        que a la larga pintar en lote no es más rápido que de uno en uno (como
+        mucho permite una ráfaga de un lote). Todo el lote se verifica con una
+        sola consulta.
         
-        # Buscar el usuario en la base de datos
-        user = db.query(User).filter(User.id == user_id).first()
+        Con Redis, si el usuario puede pintar, la verificación ya registra este
+        momento como su último píxel (de forma atómica): si la escritura en la BD
+        falla después, el usuario igual debe esperar el cooldown.
+        
+        Args:
+            user_id: Identificador del usuario
+            pixel_count: Cantidad de píxeles del lote
+            db: Sesión de base de datos
         
-        # Si el usuario no existe o nunca ha pintado, puede pintar
-        if not user or not user.last_pixel_at:
+        Returns:
+            Tupla de (puede_pintar, segundos_restantes)
+            - puede_pintar: True si el usuario puede pintar el lote ahora
+            - segundos_restantes: Segundos que debe esperar (0 si puede pintar)
+        """
+        # Sin cooldown no hay nada que verificar. Además el script de Redis fallaría:
+        # el tiempo de vida de la clave sería 0, y Redis rechaza "EX 0"
+        if self.cooldown_seconds <= 0:
             return True, 0
         
-        # Calcular cuánto tiempo ha pasado desde el último píxel
-        time_since_last_pixel = datetime.utcnow() - user.last_pixel_at
-        seconds_elapsed = time_since_last_pixel.total_seconds()
+        required_seconds = self.cooldown_seconds * pixel_count
+        
+        if self._check_cooldown_script is not None:
+            try:
+                seconds_remaining = await self._check_cooldown_script(
+                    keys=[f"{COOLDOWN_KEY_PREFIX}{user_id}"],
+                    args=[required_seconds, self._max_banked_seconds]
+                )
+                return seconds_remaining == 0, seconds_remaining
+            except redis.RedisError:
+                # Redis no responde: verificar con PostgreSQL
+                pass
+        
+        return await self._check_batch_db(user_id, self._cooldown_td * pixel_count, db)
+    
+    async def _check_batch_db(self, user_id: UUID, required: timedelta, db: AsyncSession) -> Tuple[bool, int]:
+        """
+        Verifica el cooldown con users.last_pixel_at en PostgreSQL.
+        
+        Args:
+            user_id: Identificador del usuario
+            required: Tiempo que debe haber pasado desde el último píxel
+            db: Sesión de base de datos
+        
+        Returns:
+            Tupla de (puede_pintar, segundos_restantes)
+        """
+        from .models import User
+        
+        # Leer solo la columna que necesitamos, no la fila completa: nos ahorramos
+        # crear un objeto User (y registrarlo en la sesión) solo para un timestamp
+        last_pixel_at = await db.scalar(
+            select(User.last_pixel_at).where(User.id == user_id)
+        )
+        
+        # Calcular cuánto tiempo ha pasado desde el último píxel, con el mismo tope
+        # que en Redis: nunca más que el máximo acumulable
+        # Si el usuario no existe o nunca ha pintado (la consulta retorna None en
+        # ambos casos), cuenta como si tuviera el máximo acumulado
+        # last_pixel_at tiene zona horaria, así que comparamos con la hora actual en UTC
+        if last_pixel_at is None:
+            time_since_last_pixel = self._max_banked_td
+        else:
+            time_since_last_pixel = min(
+                datetime.now(timezone.utc) - last_pixel_at,
+                self._max_banked_td
+            )
         
         # Si ya pasó el tiempo de cooldown, puede pintar
-        if seconds_elapsed >= self.cooldown_seconds:
+        # Comparar dos timedelta es comparar enteros (días, segundos, microsegundos)
+        if time_since_last_pixel >= required:
             return True, 0
         
-        # Calcular cuántos segundos faltan
-        seconds_remaining = int(self.cooldown_seconds - seconds_elapsed)
+        # Calcular cuántos segundos faltan (solo aquí convertimos a segundos)
+        # Redondeamos hacia arriba y nunca menos de 1, igual que el script de Redis:
+        # si falta menos de un segundo, el usuario no puede pintar y no debemos decirle "0"
+        seconds_remaining = max(1, math.ceil((required - time_since_last_pixel).total_seconds()))
         
         return False, seconds_remaining
     
-    def record_pixel_placement(self, user_id: str, db: Session) -> None:
+    async def record_pixel_placement(self, user_id: UUID, db: AsyncSession) -> None:
         """
         Registra que un usuario acaba de pintar un píxel.
         
@@ -82,7 +212,8 @@ class RateLimiter:
             user_id: Identificador del usuario
             db: Sesión de base de datos
         """
-        # Esta función ya no hace nada porque update_user_pixel_stats
-        # en crud.py ya actualiza el last_pixel_at
+        # Esta función ya no hace nada porque create_pixel_events
+        # en crud.py ya actualiza el last_pixel_at, y con Redis el script
+        # del cooldown ya registró el píxel al verificarlo
         # La dejamos por si en el futuro queremos agregar lógica adicional aquí
         pass
\ No newline at end of file
@@ -0,0 +1,177 @@
+"""
+Actualizaciones del canvas en tiempo real por WebSocket.
+
+En vez de que cada cliente descargue el canvas completo una y otra vez, el cliente
+abre un WebSocket en /ws/canvas, recibe el estado completo una sola vez al
+conectarse, y a partir de ahí solo recibe los píxeles que se van pintando
+("deltas"): unos pocos bytes por píxel en vez de todo el canvas.
+
+Con varios procesos de la API (varios workers de uvicorn), un píxel pintado en un
+proceso tiene que llegar a los clientes conectados a los demás. Para eso cada
+proceso publica los píxeles en el canal "canvas:events" de Redis (pub/sub) y
+mantiene UNA suscripción a ese canal, que reparte los mensajes entre sus propios
+clientes. Sin Redis, los mensajes se reparten directamente entre los clientes
+del proceso (suficiente con un solo worker).
+
+Formato de los mensajes (JSON, como texto):
+    {"type": "state", "canvas": {...}}   estado completo, el primero al conectarse
+    {"type": "pixels", "pixels": [{"x": 15, "y": 20, "c": 16734003,
+                                   "u": "b1e3de83-d28e-536e-b5a7-cf74f633ffc2",
+                                   "t": "2025-01-15T14:30:00+00:00"}]}
+donde "c" es el color como entero RGB (0xRRGGBB).
+"""
+
+import asyncio
+from contextlib import suppress
+from typing import List, Optional, Set
+import orjson
+import redis
+from fastapi import WebSocket
+
+from . import models
+from .database import redis_client
+
+# Canal de Redis donde se publican los píxeles pintados
+CANVAS_EVENTS_CHANNEL = "canvas:events"
+
+# Máximo de mensajes pendientes por cliente
+# Si un cliente lento acumula más, lo desconectamos: al reconectarse recibe el
+# estado completo de nuevo, en vez de retener memoria sin límite en el servidor
+CLIENT_QUEUE_SIZE = 256
+
+# Segundos de espera antes de volver a suscribirse si se pierde la conexión a Redis
+RESUBSCRIBE_DELAY_SECONDS = 1
+
+# Colas de los clientes conectados a este proceso
+# Cada cliente tiene su propia cola: un cliente lento no frena a los demás
+_client_queues: Set[asyncio.Queue] = set()
+
+
+def subscribe() -> asyncio.Queue:
+    """
+    Registra un cliente nuevo y retorna la cola donde recibirá los mensajes.
+
+    Hay que registrarse ANTES de leer el estado completo del canvas: los píxeles
+    pintados mientras tanto quedan en la cola y se envían después del estado,
+    así el cliente no se pierde ninguno.
+    """
+    queue = asyncio.Queue(maxsize=CLIENT_QUEUE_SIZE)
+    _client_queues.add(queue)
+    return queue
+
+
+def unsubscribe(queue: asyncio.Queue) -> None:
+    """Quita un cliente de la lista de clientes conectados."""
+    _client_queues.discard(queue)
+
+
+def _fan_out(message: str) -> None:
+    """
+    Entrega un mensaje a todos los clientes conectados a este proceso.
+
+    No espera a ningún cliente: solo deja el mensaje en cada cola.
+    """
+    for queue in list(_client_queues):
+        try:
+            queue.put_nowait(message)
+        except asyncio.QueueFull:
+            # Cliente demasiado lento: vaciamos su cola y dejamos None como señal
+            # para que forward_events() cierre la conexión
+            while not queue.empty():
+                queue.get_nowait()
+            queue.put_nowait(None)
+            _client_queues.discard(queue)
+
+
+def state_message(canvas_payload: bytes) -> str:
+    """
+    Construye el mensaje con el estado completo del canvas.
+
+    Args:
+        canvas_payload: El JSON del canvas ya serializado (el mismo de /api/canvas/state)
+    """
+    # Concatenamos los bytes en vez de parsear y volver a serializar el canvas
+    return (b'{"type":"state","canvas":' + canvas_payload + b'}').decode()
+
+
+async def publish_pixels(pixel_events: List[models.PixelEvent]) -> None:
+    """
+    Avisa a todos los clientes conectados de los píxeles recién pintados.
+
+    Debe llamarse después del commit: los clientes no deben ver píxeles que
+    todavía podrían deshacerse con un rollback.
+
+    Args:
+        pixel_events: Los eventos recién creados (con el color como entero)
+    """
+    message = orjson.dumps({
+        'type': 'pixels',
+        'pixels': [
+            {
+                'x': event.x,
+                'y': event.y,
+                'c': event.color,
+                'u': event.user_id,
+                't': event.created_at.isoformat()
+            }
+            for event in pixel_events
+        ]
+    }).decode()
+
+    if redis_client is not None:
+        try:
+            # El listener de cada proceso (incluido este) lo reparte a sus clientes
+            await redis_client.publish(CANVAS_EVENTS_CHANNEL, message)
+            return
+        except redis.RedisError:
+            # Sin Redis al menos avisamos a los clientes de este proceso
+            pass
+
+    _fan_out(message)
+
+
+async def listen_for_pixels() -> None:
+    """
+    Escucha el canal de Redis y reparte los mensajes entre los clientes locales.
+
+    Se ejecuta como tarea en segundo plano durante toda la vida del proceso
+    (ver lifespan en main.py), y solo si Redis está configurado. Si la conexión
+    a Redis se cae (o falla cualquier otra cosa), vuelve a suscribirse después
+    de una pausa.
+    """
+    while True:
+        pubsub = redis_client.pubsub()
+        try:
+            await pubsub.subscribe(CANVAS_EVENTS_CHANNEL)
+
+            async for message in pubsub.listen():
+                # listen() también entrega las confirmaciones de suscripción
+                if message['type'] == 'message':
+                    _fan_out(message['data'].decode())
+        except Exception:
+            # Cualquier error (no solo de Redis, por ejemplo un mensaje inesperado)
+            # terminaría la tarea para siempre y los clientes dejarían de recibir
+            # píxeles sin aviso: volvemos a suscribirnos después de una pausa
+            # (la cancelación al apagar la API no es una Exception, así que sí termina)
+            await asyncio.sleep(RESUBSCRIBE_DELAY_SECONDS)
+        finally:
+            with suppress(Exception):
+                await pubsub.aclose()
+
+
+async def forward_events(websocket: WebSocket, queue: asyncio.Queue) -> None:
+    """
+    Envía al cliente los mensajes que van llegando a su cola.
+
+    Termina (cerrando la conexión) si el cliente se quedó atrás; en ese caso el
+    cliente debe reconectarse para recibir el estado completo otra vez.
+    """
+    while True:
+        message: Optional[str] = await queue.get()
+
+        if message is None:
+            # 1013 = "Try Again Later"
+            await websocket.close(code=1013)
+            return
+
+        await websocket.send_text(message)
@@ -10,14 +10,69 @@ Pydantic automáticamente:
 2. Convierte tipos cuando es posible (ej: "123" -> 123)
 3. Genera errores descriptivos cuando la validación falla
 4. Crea documentación automática para FastAPI
+
+Los esquemas de respuesta usan frozen=True (inmutables) y extra='forbid' (sin
+campos que no estén declarados): son datos de salida que se construyen una vez
+y se serializan, nunca se modifican.
 """
 
-from pydantic import BaseModel, Field, field_validator
+from pydantic import BaseModel, ConfigDict, Field, TypeAdapter, field_serializer, field_validator
 from typing import Optional, List
 from datetime import datetime
+from uuid import UUID, uuid5
 import re
 
 
+# Patrón para colores hex: # seguido de exactamente 6 caracteres hex
+# Se compila una sola vez al importar el módulo, no en cada petición
+_HEX_RE = re.compile(r'#[0-9A-Fa-f]{6}')
+
+
+# Espacio de nombres para derivar el UUID de un usuario a partir de su identificador
+# Es una constante fija: cambiarla cambiaría el UUID de todos los usuarios existentes
+USER_ID_NAMESPACE = UUID('6b786d6a-8b01-4d23-9994-0fb02d6f03be')
+
+
+def user_uuid(user_id: str) -> UUID:
+    """
+    Convierte el identificador de usuario que recibe la API al UUID que guarda la BD.
+    
+    Los usuarios anónimos se identifican con un string cualquiera (un ID de sesión,
+    una IP hasheada, "anonymous_user"...). En la BD guardamos un UUID de 16 bytes
+    fijos: ocupa menos que el string y compararlo es comparar 16 bytes.
+    
+    uuid5() deriva siempre el mismo UUID para el mismo string, así que no hace
+    falta guardar el identificador original. Si el identificador ya es un UUID
+    (por ejemplo uno que la API devolvió antes), se usa tal cual.
+    
+    Args:
+        user_id: Identificador del usuario tal como llegó en la petición
+    
+    Returns:
+        El UUID del usuario
+    """
+    try:
+        return UUID(user_id)
+    except ValueError:
+        return uuid5(USER_ID_NAMESPACE, user_id)
+
+
+def format_hex_color(color: int) -> str:
+    """
+    Convierte un color guardado como entero RGB (0xRRGGBB) al formato '#RRGGBB'.
+    
+    La API siempre habla de colores en hex, pero internamente (y en la BD) son
+    enteros: la conversión se hace solo aquí, en el borde de la API.
+    
+    Args:
+        color: Color como entero de 24 bits
+    
+    Returns:
+        El color en formato hex, en mayúsculas (por ejemplo 0xFF5733 -> '#FF5733')
+    """
+    return f"#{color:06X}"
+
+
 class PixelPlaceRequest(BaseModel):
     """
     Esquema para la solicitud de pintar un píxel.
@@ -45,52 +100,50 @@ class PixelPlaceRequest(BaseModel):
         description="Coordenada Y del píxel (0-indexed)"
     )
     
-    color: str = Field(
+    color: int = Field(
         ...,
-        min_length=7,
-        max_length=7,
-        description="Color en formato hexadecimal (#RRGGBB)"
+        description="Color en formato hexadecimal (#RRGGBB)",
+        # El cliente envía un string '#RRGGBB'; después de validar, el campo
+        # contiene el entero RGB (ver validate_hex_color). Para la documentación
+        # describimos lo que envía el cliente, no el tipo interno
+        json_schema_extra={"type": "string", "pattern": "^#[0-9A-Fa-f]{6}$"}
     )
     
-    @field_validator('color')
+    @field_validator('color', mode='before')
     @classmethod
-    def validate_hex_color(cls, value: str) -> str:
+    def validate_hex_color(cls, value) -> int:
         """
         Validador personalizado para el campo color.
         
-        Este método se ejecuta automáticamente después de las validaciones básicas.
-        Verifica que el color sea un hexadecimal válido de CSS.
+        Con mode='before' se ejecuta antes de la validación de tipo de Pydantic,
+        sobre el valor tal como llegó en el JSON. Verifica que el color sea un
+        hexadecimal válido de CSS y lo convierte al entero RGB que guarda la BD.
         
         Args:
-            value: El valor del campo color que ya pasó las validaciones básicas
+            value: El valor del campo color tal como llegó en la petición
         
         Returns:
-            El valor en mayúsculas si es válido
+            El color como entero de 24 bits (por ejemplo '#FF5733' -> 0xFF5733)
         
         Raises:
             ValueError: Si el formato del color no es válido
         """
-        # Patrón regex para colores hex: # seguido de exactamente 6 caracteres hex
-        # ^ marca el inicio, $ marca el final (debe coincidir exactamente)
-        pattern = r'^#[0-9A-Fa-f]{6}$'
-        
-        if not re.match(pattern, value):
+        # fullmatch() exige que todo el string coincida con el patrón (sin ^ ni $;
+        # además, a diferencia de $, no acepta un salto de línea al final)
+        if not isinstance(value, str) or not _HEX_RE.fullmatch(value):
             raise ValueError(
                 f"El color '{value}' no es un hexadecimal válido. "
                 f"Debe tener el formato #RRGGBB (ej: #FF5733)"
             )
         
-        # Retornar en mayúsculas para normalizar (tanto #ff5733 como #FF5733 son válidos)
-        return value.upper()
+        # int(..., 16) acepta mayúsculas y minúsculas (#ff5733 y #FF5733 son el mismo color)
+        return int(value[1:], 16)
     
-    class Config:
-        """
-        Configuración del esquema Pydantic.
-        
-        json_schema_extra proporciona ejemplos para la documentación automática.
-        Cuando abras /docs en FastAPI, verás estos ejemplos.
-        """
-        json_schema_extra = {
+    # Configuración del esquema Pydantic
+    # json_schema_extra proporciona ejemplos para la documentación automática.
+    # Cuando abras /docs en FastAPI, verás estos ejemplos.
+    model_config = ConfigDict(
+        json_schema_extra={
             "examples": [
                 {
                     "x": 15,
@@ -99,6 +152,92 @@ class PixelPlaceRequest(BaseModel):
                 }
             ]
         }
+    )
+
+
+# Máximo de píxeles que se pueden pintar en una sola petición de lote
+# También es el máximo de cooldowns que un usuario puede "ahorrar" sin pintar
+# (ver rate_limiter.py): un usuario nuevo o que estuvo inactivo puede pintar como
+# mucho este lote de golpe, no cientos de píxeles. Debe ser pequeño
+MAX_PIXELS_PER_BATCH = 16
+
+
+class PixelPlaceBatchRequest(BaseModel):
+    """
+    Esquema para la solicitud de pintar varios píxeles a la vez.
+    
+    Útil cuando el usuario arrastra el pincel: en vez de una petición HTTP
+    por píxel, el cliente envía todos los píxeles juntos.
+    
+    Ejemplo de JSON válido:
+    {
+        "pixels": [
+            {"x": 15, "y": 20, "color": "#FF5733"},
+            {"x": 16, "y": 20, "color": "#FF5733"}
+        ]
+    }
+    """
+    
+    pixels: List[PixelPlaceRequest] = Field(
+        ...,
+        min_length=1,
+        max_length=MAX_PIXELS_PER_BATCH,
+        description=f"Píxeles a pintar (entre 1 y {MAX_PIXELS_PER_BATCH})"
+    )
+    
+    model_config = ConfigDict(
+        json_schema_extra={
+            "examples": [
+                {
+                    "pixels": [
+                        {"x": 15, "y": 20, "color": "#FF5733"},
+                        {"x": 16, "y": 20, "color": "#FF5733"}
+                    ]
+                }
+            ]
+        }
+    )
+
+
+class PixelInfo(BaseModel):
+    """
+    Información sobre un píxel específico.
+    
+    Usado tanto para respuestas individuales como dentro de listas.
+    """
+    
+    x: int = Field(..., description="Coordenada X")
+    y: int = Field(..., description="Coordenada Y")
+    color: int = Field(..., description="Color hexadecimal")
+    user_id: UUID = Field(..., description="ID del usuario que pintó este píxel")
+    timestamp: str = Field(..., description="Cuándo se pintó (ISO 8601)")
+    
+    @field_serializer('color')
+    def serialize_color(self, color: int) -> str:
+        """El color llega de la BD como entero; la API lo devuelve como '#RRGGBB'."""
+        return format_hex_color(color)
+    
+    model_config = ConfigDict(
+        frozen=True,
+        extra='forbid',
+        json_schema_extra={
+            "examples": [
+                {
+                    "x": 10,
+                    "y": 15,
+                    "color": "#3357FF",
+                    "user_id": "6dae47a2-3bdd-557e-aa9f-d9bb1a7c0d8e",
+                    "timestamp": "2025-01-15T14:30:00"
+                }
+            ]
+        }
+    )
+
+
+# Serializador de listas de PixelInfo, construido una sola vez al importar el módulo
+# dump_json() serializa toda la lista directamente a bytes JSON en pydantic-core (Rust),
+# sin pasar por dicts intermedios ni por la validación de la respuesta de FastAPI
+PIXEL_INFO_LIST_ADAPTER = TypeAdapter(List[PixelInfo])
 
 
 class PixelPlaceResponse(BaseModel):
@@ -118,7 +257,7 @@ class PixelPlaceResponse(BaseModel):
         description="Mensaje descriptivo del resultado"
     )
     
-    pixel: dict = Field(
+    pixel: PixelInfo = Field(
         ...,
         description="Información del píxel pintado"
     )
@@ -128,8 +267,10 @@ class PixelPlaceResponse(BaseModel):
         description="Segundos hasta que el usuario pueda pintar de nuevo"
     )
     
-    class Config:
-        json_schema_extra = {
+    model_config = ConfigDict(
+        frozen=True,
+        extra='forbid',
+        json_schema_extra={
             "examples": [
                 {
                     "success": True,
@@ -138,39 +279,70 @@ class PixelPlaceResponse(BaseModel):
                         "x": 15,
                         "y": 20,
                         "color": "#FF5733",
-                        "user_id": "anonymous_abc123"
+                        "user_id": "b1e3de83-d28e-536e-b5a7-cf74f633ffc2",
+                        "timestamp": "2025-01-15T14:30:00+00:00"
                     },
                     "cooldown_remaining": 30
                 }
             ]
         }
+    )
 
 
-class PixelInfo(BaseModel):
+class PixelPlaceBatchResponse(BaseModel):
     """
-    Información sobre un píxel específico.
-    
-    Usado tanto para respuestas individuales como dentro de listas.
+    Respuesta exitosa al pintar un lote de píxeles.
     """
     
-    x: int = Field(..., description="Coordenada X")
-    y: int = Field(..., description="Coordenada Y")
-    color: str = Field(..., description="Color hexadecimal")
-    user_id: str = Field(..., description="ID del usuario que pintó este píxel")
-    timestamp: str = Field(..., description="Cuándo se pintó (ISO 8601)")
+    success: bool = Field(
+        default=True,
+        description="Indica si la operación fue exitosa"
+    )
+    
+    message: str = Field(
+        default="Píxeles pintados exitosamente",
+        description="Mensaje descriptivo del resultado"
+    )
+    
+    pixels: List[PixelInfo] = Field(
+        ...,
+        description="Información de los píxeles pintados, en el orden enviado"
+    )
     
-    class Config:
-        json_schema_extra = {
+    cooldown_remaining: int = Field(
+        default=0,
+        description="Segundos hasta que el usuario pueda pintar de nuevo"
+    )
+    
+    model_config = ConfigDict(
+        frozen=True,
+        extra='forbid',
+        json_schema_extra={
             "examples": [
                 {
-                    "x": 10,
-                    "y": 15,
-                    "color": "#3357FF",
-                    "user_id": "anonymous_xyz789",
-                    "timestamp": "2025-01-15T14:30:00"
+                    "success": True,
+                    "message": "Píxeles pintados exitosamente",
+                    "pixels": [
+                        {
+                            "x": 15,
+                            "y": 20,
+                            "color": "#FF5733",
+                            "user_id": "b1e3de83-d28e-536e-b5a7-cf74f633ffc2",
+                            "timestamp": "2025-01-15T14:30:00+00:00"
+                        },
+                        {
+                            "x": 16,
+                            "y": 20,
+                            "color": "#FF5733",
+                            "user_id": "b1e3de83-d28e-536e-b5a7-cf74f633ffc2",
+                            "timestamp": "2025-01-15T14:30:00+00:00"
+                        }
+                    ],
+                    "cooldown_remaining": 30
                 }
             ]
         }
+    )
 
 
 class CanvasStateResponse(BaseModel):
@@ -186,8 +358,10 @@ class CanvasStateResponse(BaseModel):
     pixels: List[PixelInfo] = Field(..., description="Lista de todos los píxeles pintados")
     total_pixels: int = Field(..., description="Total de píxeles en el canvas")
     
-    class Config:
-        json_schema_extra = {
+    model_config = ConfigDict(
+        frozen=True,
+        extra='forbid',
+        json_schema_extra={
             "examples": [
                 {
                     "width": 32,
@@ -197,7 +371,7 @@ class CanvasStateResponse(BaseModel):
                             "x": 0,
                             "y": 0,
                             "color": "#FF0000",
-                            "user_id": "user1",
+                            "user_id": "5ea11819-da34-5d27-8619-b10e27303dbf",
                             "timestamp": "2025-01-15T10:00:00"
                         }
                     ],
@@ -205,6 +379,7 @@ class CanvasStateResponse(BaseModel):
                 }
             ]
         }
+    )
 
 
 class CanvasInfoResponse(BaseModel):
@@ -220,8 +395,10 @@ class CanvasInfoResponse(BaseModel):
     active_users_24h: int = Field(..., description="Usuarios activos en las últimas 24 horas")
     cooldown_seconds: int = Field(..., description="Tiempo de espera entre píxeles")
     
-    class Config:
-        json_schema_extra = {
+    model_config = ConfigDict(
+        frozen=True,
+        extra='forbid',
+        json_schema_extra={
             "examples": [
                 {
                     "width": 32,
@@ -232,6 +409,39 @@ class CanvasInfoResponse(BaseModel):
                 }
             ]
         }
+    )
+
+
+class PixelHistoryEntry(BaseModel):
+    """
+    Un evento del historial de un píxel: quién lo pintó, de qué color y cuándo.
+    
+    Las coordenadas no se repiten en cada evento: van una sola vez en
+    PixelHistoryResponse.
+    """
+    
+    color: int = Field(..., description="Color hexadecimal")
+    user_id: UUID = Field(..., description="ID del usuario que pintó el píxel")
+    timestamp: str = Field(..., description="Cuándo se pintó (ISO 8601)")
+    
+    @field_serializer('color')
+    def serialize_color(self, color: int) -> str:
+        """El color llega de la BD como entero; la API lo devuelve como '#RRGGBB'."""
+        return format_hex_color(color)
+    
+    model_config = ConfigDict(
+        frozen=True,
+        extra='forbid',
+        json_schema_extra={
+            "examples": [
+                {
+                    "color": "#FF5733",
+                    "user_id": "57870035-1cd9-5bd4-89f7-2e7193b70fda",
+                    "timestamp": "2025-01-15T14:00:00"
+                }
+            ]
+        }
+    )
 
 
 class PixelHistoryResponse(BaseModel):
@@ -243,11 +453,17 @@ class PixelHistoryResponse(BaseModel):
     
     x: int = Field(..., description="Coordenada X del píxel")
     y: int = Field(..., description="Coordenada Y del píxel")
-    history: List[dict] = Field(..., description="Lista de eventos históricos")
-    total_changes: int = Field(..., description="Número total de veces que se pintó este píxel")
+    history: List[PixelHistoryEntry] = Field(..., description="Lista de eventos históricos")
+    total_changes: int = Field(..., description="Número de eventos en esta página del historial")
+    next_cursor: Optional[int] = Field(
+        None,
+        description="Valor de before_id para pedir la página siguiente (null si no hay más)"
+    )
     
-    class Config:
-        json_schema_extra = {
+    model_config = ConfigDict(
+        frozen=True,
+        extra='forbid',
+        json_schema_extra={
             "examples": [
                 {
                     "x": 15,
@@ -255,19 +471,21 @@ class PixelHistoryResponse(BaseModel):
                     "history": [
                         {
                             "color": "#FF5733",
-                            "user_id": "user2",
+                            "user_id": "57870035-1cd9-5bd4-89f7-2e7193b70fda",
                             "timestamp": "2025-01-15T14:00:00"
                         },
                         {
                             "color": "#33FF57",
-                            "user_id": "user1",
+                            "user_id": "5ea11819-da34-5d27-8619-b10e27303dbf",
                             "timestamp": "2025-01-15T12:00:00"
                         }
                     ],
-                    "total_changes": 2
+                    "total_changes": 2,
+                    "next_cursor": None
                 }
             ]
         }
+    )
 
 
 class UserStatsResponse(BaseModel):
@@ -275,17 +493,19 @@ class UserStatsResponse(BaseModel):
     Estadísticas de un usuario específico.
     """
     
-    user_id: str = Field(..., description="Identificador del usuario")
+    user_id: UUID = Field(..., description="Identificador del usuario")
     username: Optional[str] = Field(None, description="Nombre de usuario (si existe)")
     total_pixels_placed: int = Field(..., description="Total de píxeles pintados por este usuario")
     last_pixel_at: Optional[str] = Field(None, description="Última vez que pintó un píxel")
     member_since: str = Field(..., description="Cuándo se registró el usuario")
     
-    class Config:
-        json_schema_extra = {
+    model_config = ConfigDict(
+        frozen=True,
+        extra='forbid',
+        json_schema_extra={
             "examples": [
                 {
-                    "user_id": "anonymous_abc123",
+                    "user_id": "b1e3de83-d28e-536e-b5a7-cf74f633ffc2",
                     "username": None,
                     "total_pixels_placed": 12,
                     "last_pixel_at": "2025-01-15T14:30:00",
@@ -293,6 +513,7 @@ class UserStatsResponse(BaseModel):
                 }
             ]
         }
+    )
 
 
 class ErrorResponse(BaseModel):
@@ -307,8 +528,10 @@ class ErrorResponse(BaseModel):
     message: str = Field(..., description="Mensaje descriptivo del error")
     details: Optional[dict] = Field(None, description="Información adicional sobre el error")
     
-    class Config:
-        json_schema_extra = {
+    model_config = ConfigDict(
+        frozen=True,
+        extra='forbid',
+        json_schema_extra={
             "examples": [
                 {
                     "success": False,
@@ -319,4 +542,5 @@ class ErrorResponse(BaseModel):
                     }
                 }
             ]
-        }
\ No newline at end of file
+        }
+    )
\ No newline at end of file
@@ -0,0 +1,42 @@
+"""
+Script para reconstruir la tabla pixel_current desde el historial de pixel_events.
+
+La API mantiene pixel_current al día con cada píxel pintado, así que en
+operación normal no hace falta. Sirve para:
+- Poblarla en una base de datos que ya tenía eventos antes de que existiera
+  la tabla (ver "Actualizar una base de datos existente" en el README)
+- Repararla si alguna vez se desincroniza del historial
+
+Uso (desde la carpeta backend/, después de "alembic upgrade head"):
+    python rebuild_pixel_current.py
+"""
+
+import asyncio
+
+from app import cache
+from app.crud import rebuild_pixel_current
+from app.database import SessionLocal, engine, redis_client
+
+
+async def main() -> None:
+    async with SessionLocal() as db:
+        # rebuild_pixel_current hace su propio commit
+        await rebuild_pixel_current(db)
+
+    # pixel_current cambió: si la API está corriendo, el estado cacheado en Redis
+    # es el de antes de la reparación. Subir la versión obliga a recalcularlo
+    await cache.invalidate_canvas_state()
+
+    # Cerrar las conexiones del pool y de Redis antes de que termine el script
+    await engine.dispose()
+    if redis_client is not None:
+        await redis_client.aclose()
+
+
+if __name__ == "__main__":
+    print("🔄 Reconstruyendo pixel_current desde pixel_events...")
+
+    # main es una corutina: asyncio.run() crea el event loop y la ejecuta
+    asyncio.run(main())
+
+    print("✅ pixel_current reconstruida correctamente")
@@ -5,6 +5,9 @@
 // URL base del backend (cambiar si usas otro puerto/host)
 const API_BASE_URL = 'http://127.0.0.1:8000/api';
 
+// URL del WebSocket de actualizaciones en tiempo real (mismo host, ws:// en vez de http://)
+const WS_URL = API_BASE_URL.replace(/^http/, 'ws').replace(/\/api$/, '') + '/ws/canvas';
+
 const GRID_SIZE = 32;
 const PIXEL_SIZE = 20;
 const CANVAS_SIZE = GRID_SIZE * PIXEL_SIZE;
@@ -75,6 +78,43 @@ async function getCanvasState() {
     return await apiRequest('/canvas/state');
 }
 
+/**
+ * Obtener el estado completo del canvas en formato binario
+ * 4 bytes (R, G, B, A) por celda en orden row-major; alpha 0 = sin pintar
+ * @returns {Promise<Uint8Array>} - Buffer RGBA de GRID_SIZE * GRID_SIZE * 4 bytes
+ */
+async function getCanvasStateBinary() {
+    try {
+        const response = await fetch(`${API_BASE_URL}/canvas/state.bin`);
+
+        if (!response.ok) {
+            throw new Error('Error en la petición');
+        }
+
+        return new Uint8Array(await response.arrayBuffer());
+    } catch (error) {
+        console.error('Error en API:', error);
+        throw error;
+    }
+}
+
+/**
+ * Abrir el WebSocket de actualizaciones del canvas
+ * Al conectarse llega un mensaje {type: 'state', canvas} con el estado completo,
+ * y después un mensaje {type: 'pixels', pixels} cada vez que alguien pinta
+ * @param {function} onMessage - Recibe cada mensaje ya parseado
+ * @param {function} onClose - Se llama cuando se cierra la conexión
+ * @returns {WebSocket} - El socket abierto
+ */
+function openCanvasSocket(onMessage, onClose) {
+    const socket = new WebSocket(WS_URL);
+
+    socket.addEventListener('message', (event) => onMessage(JSON.parse(event.data)));
+    socket.addEventListener('close', onClose);
+
+    return socket;
+}
+
 /**
  * Obtener información de un píxel específico
  * @param {number} x - Coordenada X
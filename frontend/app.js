@@ -20,6 +20,11 @@ let canPaint = true;             // ¿Usuario puede pintar? (cooldown)
 let cooldownEndTime = null;      // Timestamp de cuándo termina el cooldown
 let userId = 'anonymous_user';   // ID del usuario (por ahora estático)
 let canvasState = {};            // Estado actual del canvas {`x,y`: color}
+let canvasLoaded = false;        // ¿Ya llegó el estado completo del canvas?
+let httpFallbackTried = false;   // ¿Ya intentamos cargar el canvas por HTTP?
+
+// Milisegundos de espera antes de reconectar el WebSocket
+const SOCKET_RECONNECT_DELAY_MS = 3000;
 
 /* ===================================
    INICIALIZACIÓN
@@ -42,8 +47,9 @@ async function init() {
     // 1. Dibujar el grid vacío
     drawEmptyGrid();
 
-    // 2. Cargar el estado actual del canvas desde el backend
-    await loadCanvasState();
+    // 2. Conectar el WebSocket: trae el estado actual del canvas y luego
+    //    los píxeles que pinten los demás, sin tener que volver a pedir todo
+    connectCanvasSocket();
 
     // 3. Cargar estadísticas generales
     await updateStats();
@@ -122,6 +128,17 @@ function redrawCanvas() {
     }
 }
 
+/**
+ * Convierte componentes RGB (0-255) a un color #RRGGBB
+ * @param {number} r - Rojo
+ * @param {number} g - Verde
+ * @param {number} b - Azul
+ * @returns {string} - Color en formato #RRGGBB
+ */
+function rgbToHex(r, g, b) {
+    return '#' + [r, g, b].map(c => c.toString(16).padStart(2, '0')).join('').toUpperCase();
+}
+
 /* ===================================
    CARGA DE DATOS DEL BACKEND
    =================================== */
@@ -131,16 +148,25 @@ function redrawCanvas() {
  */
 async function loadCanvasState() {
     try {
-        const data = await getCanvasState();
+        const rgba = await getCanvasStateBinary();
 
-        // Convertir array de píxeles a objeto {`x,y`: color}
+        // Convertir el buffer RGBA a objeto {`x,y`: color}
         canvasState = {};
-        data.pixels.forEach(pixel => {
-            const key = `${pixel.x},${pixel.y}`;
-            canvasState[key] = pixel.color;
-        });
+        for (let y = 0; y < GRID_SIZE; y++) {
+            for (let x = 0; x < GRID_SIZE; x++) {
+                const offset = (y * GRID_SIZE + x) * 4;
+
+                // Alpha 0 significa que la celda nunca se ha pintado
+                if (rgba[offset + 3] === 0) {
+                    continue;
+                }
+
+                canvasState[`${x},${y}`] = rgbToHex(rgba[offset], rgba[offset + 1], rgba[offset + 2]);
+            }
+        }
 
         // Redibujar el canvas con los datos
+        canvasLoaded = true;
         redrawCanvas();
 
         console.log(`📊 Canvas cargado: ${Object.keys(canvasState).length} píxeles`);
@@ -151,6 +177,51 @@ async function loadCanvasState() {
     }
 }
 
+/**
+ * Conecta (o reconecta) el WebSocket de actualizaciones del canvas
+ */
+function connectCanvasSocket() {
+    openCanvasSocket(handleSocketMessage, () => {
+        console.warn('🔌 WebSocket cerrado, reconectando...');
+
+        // Si el WebSocket no funciona, cargar al menos el estado por HTTP (una vez)
+        if (!canvasLoaded && !httpFallbackTried) {
+            httpFallbackTried = true;
+            loadCanvasState();
+        }
+
+        // Al reconectar llega el estado completo otra vez, así que no se pierde nada
+        setTimeout(connectCanvasSocket, SOCKET_RECONNECT_DELAY_MS);
+    });
+}
+
+/**
+ * Procesa un mensaje recibido por el WebSocket
+ * @param {object} message - Mensaje {type: 'state', canvas} o {type: 'pixels', pixels}
+ */
+function handleSocketMessage(message) {
+    if (message.type === 'state') {
+        // Estado completo: reemplaza todo lo que teníamos
+        canvasState = {};
+        for (const pixel of message.canvas.pixels) {
+            canvasState[`${pixel.x},${pixel.y}`] = pixel.color;
+        }
+
+        canvasLoaded = true;
+        redrawCanvas();
+
+        console.log(`📊 Canvas cargado: ${Object.keys(canvasState).length} píxeles`);
+    } else if (message.type === 'pixels') {
+        // Deltas: solo los píxeles recién pintados, con el color como entero 0xRRGGBB
+        for (const pixel of message.pixels) {
+            const color = '#' + pixel.c.toString(16).padStart(6, '0').toUpperCase();
+
+            canvasState[`${pixel.x},${pixel.y}`] = color;
+            drawPixel(pixel.x, pixel.y, color);
+        }
+    }
+}
+
 /**
  * Actualiza las estadísticas mostradas en la UI
  */